@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 
+import os
 import json
 import time
+import uuid
 import logging
+import threading
 import random
 import string
 import traceback
-from base_enclave_app import BaseEnclaveApp
+from base_enclave_app import BaseEnclaveApp, JobQueueFullError
 import sys
 import base64
 
@@ -14,6 +17,90 @@ import base64
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('simple-enclave')
 
+# Inputs at or above this index are computed on the job pool instead of inline
+ASYNC_THRESHOLD = int(os.environ.get('FIB_ASYNC_THRESHOLD', 10000))
+
+# Results wider than this are never rendered as JSON integers: int -> decimal
+# conversion is quadratic and capped by sys.get_int_max_str_digits()
+MAX_INT_RESULT_BITS = 4096
+
+RESULT_FORMATS = ("int", "hex", "base64")
+
+def fibonacci(n):
+    """
+    Calculate the nth Fibonacci number by fast doubling
+    
+    Module-level so it can be pickled and run on the job process pool.
+    
+    Args:
+        n (int): The index of the Fibonacci number to calculate
+        
+    Returns:
+        int: The nth Fibonacci number
+    """
+    if n <= 0:
+        return 0
+    return fib_pair(n)[0]
+
+def result_to_bytes(result):
+    """
+    Convert a Fibonacci result to its settlement bytes
+    
+    Results that fit a uint256 keep the 32-byte big-endian encoding the contract
+    expects; larger ones use the minimal big-endian encoding instead of overflowing.
+    """
+    return result.to_bytes(max(32, (result.bit_length() + 7) // 8), 'big')
+
+def format_int_result(value, fmt="int"):
+    """
+    Render an integer for a JSON response in the requested format
+    
+    "int" falls back to hex for values too wide to render as decimal cheaply.
+    """
+    if fmt == "base64":
+        return base64.b64encode(value.to_bytes((value.bit_length() + 7) // 8 or 1, 'big')).decode('utf-8')
+    if fmt == "hex" or value.bit_length() > MAX_INT_RESULT_BITS:
+        return hex(value)
+    return value
+
+# Gaps between swept indices wider than this are jumped with fast doubling
+SWEEP_JUMP_MIN_GAP = 64
+
+def fib_pair(n):
+    """Return (F(n), F(n+1)) by fast doubling in O(log n) steps"""
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        # F(2k) = F(k)(2F(k+1) - F(k)), F(2k+1) = F(k)^2 + F(k+1)^2
+        a, b = a * (2 * b - a), a * a + b * b
+        if bit == '1':
+            a, b = b, a + b
+    return a, b
+
+def fibonacci_sweep(indices):
+    """
+    Yield (n, F(n)) for every requested index in a single incremental pass
+    
+    Consecutive indices are reached by single steps; wider gaps (including the
+    one from 0 to the first index) are jumped with
+    F(m+d) = F(m)F(d+1) + (F(m+1) - F(m))F(d).
+    
+    Args:
+        indices (iterable): Non-negative indices in ascending order, e.g. a range
+        
+    Yields:
+        tuple: (n, F(n)) in ascending order of n
+    """
+    i, a, b = 0, 0, 1
+    for n in indices:
+        if n - i > SWEEP_JUMP_MIN_GAP:
+            fd, fd1 = fib_pair(n - i)
+            a, b = a * fd1 + (b - a) * fd, b * fd1 + a * fd
+            i = n
+        while i < n:
+            a, b = b, a + b
+            i += 1
+        yield n, a
+
 class SimpleEnclaveApp(BaseEnclaveApp):
     """
     Simple enclave application that extends the BaseEnclaveApp with
@@ -32,6 +119,13 @@ class SimpleEnclaveApp(BaseEnclaveApp):
         logger.info("SimpleEnclaveApp initialized")
         # Remove initial calculation since we'll now wait for initialization data
         self.result = None
+        
+        # In-progress /fibonacci-range sweeps, keyed by stream id
+        self.range_streams = {}
+        self.range_streams_lock = threading.Lock()
+        self.range_chunk_size = int(os.environ.get('FIB_RANGE_CHUNK_SIZE', 1000))
+        self.range_stream_ttl = int(os.environ.get('FIB_RANGE_STREAM_TTL', 300))
+        self.range_max_streams = int(os.environ.get('FIB_RANGE_MAX_STREAMS', 256))
 
     def initialize(self, raw_bytes):
         """
@@ -55,14 +149,21 @@ class SimpleEnclaveApp(BaseEnclaveApp):
             # Convert bytes to integer (big-endian)
             n = int.from_bytes(raw_bytes, byteorder='big')
             logger.info(f"Initializing with Fibonacci calculation for n={n}")
+            
+            # Large inputs run on the job pool; /status reports "running" until the result is stored
+            if n >= ASYNC_THRESHOLD:
+                self.result = None
+                job_id = self.submit_job(fibonacci, n, on_done=self._store_result, format_result=format_int_result)
+                logger.info(f"Submitted Fibonacci({n}) as job {job_id}")
+                return True
                 
             # Calculate Fibonacci number
             result = self.calculate_fibonacci(n)
                 
             # Store result as bytes
-            self.result = result.to_bytes(32, 'big')
+            self.result = result_to_bytes(result)
             
-            logger.info(f"Successfully calculated Fibonacci({n}) = {result}")
+            logger.info(f"Successfully calculated Fibonacci({n}) ({result.bit_length()} bits)")
             return True
             
         except Exception as e:
@@ -80,108 +181,270 @@ class SimpleEnclaveApp(BaseEnclaveApp):
         Returns:
             int: The nth Fibonacci number
         """
-        if n <= 0:
-            return 0
-        elif n == 1:
-            return 1
-        
-        a, b = 0, 1
-        for _ in range(2, n + 1):
-            a, b = b, a + b
-        
-        return b
+        return fibonacci(n)
     
-    def handle_request(self, request_data):
+    def _store_result(self, result):
+        """Store a Fibonacci result computed on the job pool as the settlement result"""
+        self.result = result_to_bytes(result)
+        logger.info(f"Stored Fibonacci result from job ({result.bit_length()} bits)")
+    
+    def handle_range_request(self, data, stream_id=None):
         """
-        Handle incoming requests by routing them to appropriate handlers
+        Handle a request for many Fibonacci values computed in one sweep
+        
+        A new sweep is started with /fibonacci-range and either {"start": a, "end": b}
+        (inclusive) or {"indices": [...]}. Values are returned in ascending order of n,
+        at most chunk_size at a time. When more remain, the response carries a
+        stream_id and the next chunk is fetched from /fibonacci-range/<stream_id>,
+        which continues the same sweep. Indices must be below ASYNC_THRESHOLD. At most
+        FIB_RANGE_MAX_STREAMS sweeps are kept open at once; a new sweep that would need
+        a stream beyond that is rejected with 429.
         
         Args:
-            request_data (dict or str): Request data containing endpoint and data, or just the endpoint string
+            data (dict): Request data
+            stream_id (str, optional): The stream to continue, from the URL path
             
         Returns:
-            dict: Response data
+            dict: Response containing the next chunk of values
         """
-        try:
-            # Parse request data
-            if isinstance(request_data, str):
-                endpoint = request_data
-                data = {}
-            else:
-                endpoint = request_data.get("endpoint", "")
-                data = request_data.get("data", {})
+        if not isinstance(data, dict):
+            data = {}
+        
+        if stream_id:
+            with self.range_streams_lock:
+                self._evict_range_streams()
+                # Take the stream out while advancing it so concurrent requests can't share the generator
+                stream = self.range_streams.pop(stream_id, None)
+            if stream is None:
+                return {"error": f"Unknown or expired stream {stream_id}"}, 404
+        else:
+            try:
+                if "indices" in data:
+                    indices = sorted({int(n) for n in data["indices"]})
+                    total = len(indices)
+                else:
+                    start, end = int(data["start"]), int(data["end"])
+                    indices = range(start, end + 1)
+                    total = len(indices)
+            except (KeyError, TypeError, ValueError):
+                return {"error": "Request must include 'start' and 'end' or 'indices'"}, 400
             
-            # Handle settlement request - this is what the contract uses for verification
-            if endpoint == "/settlement":
-                # Check if we have a result
-                if self.result is None:
-                    return {
-                        "status": "running",
-                        "computation_status": "running",
-                        "timestamp": int(time.time()),
-                        "debug_mode": False,
-                        "enclave_id": self.enclave_id,
-                        "result": "",
-                        "signature": ""
-                    }
-                
-                # The contract expects to verify raw bytes (self.result), not the JSON
-                # We should sign exactly what the contract expects to verify
-                raw_bytes_to_sign = self.result  # This is what the contract expects
-                
-                # Sign the raw bytes
-                signature = self.sign_data(raw_bytes_to_sign)
-                
-                # Create the response
-                response = {
-                    "status": "success",
-                    "computation_status": "completed",
-                    "timestamp": int(time.time()),
-                    "debug_mode": False,
-                    "enclave_id": self.enclave_id,
-                    "result": base64.b64encode(self.result).decode('utf-8'),
-                    "signature": base64.b64encode(signature).decode('utf-8')
-                }
-                
-                return response
+            if total and indices[0] < 0:
+                return {"error": "Input must be non-negative"}, 400
             
-            # Handle Fibonacci calculation request
-            elif endpoint.startswith("/fibonacci/"):
-                # Extract number from URL path
-                try:
-                    n = int(endpoint.split("/")[-1])
-                except (ValueError, IndexError):
-                    return {"error": "Invalid number in URL"}, 400
-                
-                if n < 0:
-                    return {"error": "Input must be non-negative"}, 400
-                
-                # Calculate Fibonacci number
-                result = self.calculate_fibonacci(n)
-                
-                # Convert result to bytes and store it for later use
-                self.result = result.to_bytes(32, 'big')
-                
-                # Create response for the client
-                response = {
-                    "status": "success",
-                    "enclave_id": self.enclave_id,
-                    "input": n,
-                    "result": result,
-                    "timestamp": int(time.time())
-                }
-                
-                return response
+            # Values that large are too slow to compute and render on a connector thread
+            if total and indices[-1] >= ASYNC_THRESHOLD:
+                return {"error": f"Indices must be below {ASYNC_THRESHOLD}; "
+                                 f"compute larger ones with /fibonacci/<n> and \"async\": true"}, 400
             
-            # Let the base class handle standard endpoints
-            return super().handle_request(request_data)
+            fmt = data.get("format", "int")
+            if fmt not in RESULT_FORMATS:
+                return {"error": f"format must be one of {', '.join(RESULT_FORMATS)}"}, 400
             
-        except Exception as e:
-            logger.error(f"Error handling request: {e}")
-            logger.error(traceback.format_exc())
+            try:
+                chunk_size = int(data.get("chunk_size", self.range_chunk_size))
+            except (TypeError, ValueError):
+                return {"error": "chunk_size must be an integer"}, 400
+            if chunk_size <= 0:
+                return {"error": "chunk_size must be positive"}, 400
+            chunk_size = min(chunk_size, self.range_chunk_size)
+            stream_id = str(uuid.uuid4())
+            stream = {
+                "sweep": fibonacci_sweep(indices),
+                "total": total,
+                "offset": 0,
+                "chunk_size": chunk_size,
+                "format": fmt,
+                "last_used": time.time()
+            }
+            
+            # Reserve the stream's slot before computing anything so the cap holds
+            # under concurrent requests; nobody can continue it before it is returned
+            if total > chunk_size:
+                with self.range_streams_lock:
+                    self._evict_range_streams()
+                    if len(self.range_streams) >= self.range_max_streams:
+                        return {"error": f"Too many open range streams (max {self.range_max_streams})"}, 429
+                    self.range_streams[stream_id] = stream
+        
+        values = []
+        for n, value in stream["sweep"]:
+            values.append({"n": n, "value": format_int_result(value, stream["format"])})
+            if len(values) >= stream["chunk_size"]:
+                break
+        
+        offset = stream["offset"]
+        stream["offset"] += len(values)
+        done = stream["offset"] >= stream["total"]
+        
+        response = {
+            "status": "success",
+            "enclave_id": self.enclave_id,
+            "total": stream["total"],
+            "offset": offset,
+            "values": values,
+            "done": done,
+            "timestamp": int(time.time())
+        }
+        
+        if not done:
+            stream["last_used"] = time.time()
+            with self.range_streams_lock:
+                self.range_streams[stream_id] = stream
+            response["stream_id"] = stream_id
+        else:
+            with self.range_streams_lock:
+                self.range_streams.pop(stream_id, None)
+        
+        return response
+    
+    def _evict_range_streams(self):
+        """Drop sweeps that have not been read from within the TTL. Caller holds the lock."""
+        cutoff = time.time() - self.range_stream_ttl
+        for stream_id in [sid for sid, stream in self.range_streams.items() if stream["last_used"] < cutoff]:
+            del self.range_streams[stream_id]
+    
+    def register_routes(self, router):
+        """
+        Register the Fibonacci endpoints on top of the standard ones
+        
+        Args:
+            router (Router): The router to register routes on
+        """
+        super().register_routes(router)
+        # Settlement is what the contract uses for verification
+        router.add("/settlement", self.handle_settlement_request)
+        router.add("/fibonacci/<n>", self.handle_fibonacci_request)
+        router.add("/fibonacci-range", self.handle_range_request)
+        router.add("/fibonacci-range/<stream_id>", self.handle_range_request)
+    
+    def handle_settlement_request(self, data):
+        """
+        Handle a settlement request, returning the signed result
+        
+        Args:
+            data (dict): Request data with optional "format", "offset" and "chunk_size"
+            
+        Returns:
+            dict: Response containing the result and its signature
+        """
+        # Signed once per result version and served from memory afterwards
+        settlement = self.get_signed_settlement()
+        
+        # Check if we have a result
+        if settlement is None:
+            return {
+                "status": "running",
+                "computation_status": "running",
+                "timestamp": int(time.time()),
+                "debug_mode": False,
+                "enclave_id": self.enclave_id,
+                "session_id": self.current_session.session_id,
+                "result": "",
+                "signature": ""
+            }
+        
+        # The signature covers the raw result bytes, which is what the contract verifies
+        response = {
+            "status": "success",
+            "computation_status": "completed",
+            "timestamp": int(time.time()),
+            "debug_mode": False,
+            "enclave_id": self.enclave_id,
+            "session_id": self.current_session.session_id,
+            "result_version": settlement["version"],
+            "signature": settlement["signature"]
+        }
+        
+        # Large results can be fetched in chunks with "offset"/"chunk_size"
+        if not isinstance(data, dict):
+            data = {}
+        if data.get("chunk_size") is not None or data.get("format") == "hex":
+            try:
+                response.update(self.encode_result_bytes(
+                    settlement["result"],
+                    encoding="hex" if data.get("format") == "hex" else "base64",
+                    offset=data.get("offset", 0),
+                    chunk_size=data.get("chunk_size"),
+                    digest=settlement["result_digest"]
+                ))
+            except ValueError as e:
+                return {"error": str(e)}, 400
+        else:
+            response.update({
+                "encoding": "base64",
+                "result": settlement["result_b64"],
+                "result_length": len(settlement["result"]),
+                "result_digest": settlement["result_digest"]
+            })
+        
+        return response
+    
+    def handle_fibonacci_request(self, data, n):
+        """
+        Handle a Fibonacci calculation request
+        
+        Args:
+            data (dict): Request data with optional "format" and "async"
+            n (str): The index from the URL path
+            
+        Returns:
+            dict: Response containing the result, or the job id for async requests
+                and for n >= ASYNC_THRESHOLD
+        """
+        # Parse the number from the URL path
+        try:
+            n = int(n)
+        except ValueError:
+            return {"error": "Invalid number in URL"}, 400
+        
+        if n < 0:
+            return {"error": "Input must be non-negative"}, 400
+        
+        if not isinstance(data, dict):
+            data = {}
+        fmt = data.get("format", "int")
+        if fmt not in RESULT_FORMATS:
+            return {"error": f"format must be one of {', '.join(RESULT_FORMATS)}"}, 400
+        
+        # Run on the job pool when asked to, and for inputs too large to compute
+        # and render on the connector thread; the client polls /jobs/<id>
+        if data.get("async") or n >= ASYNC_THRESHOLD:
+            try:
+                job_id = self.submit_job(fibonacci, n, on_done=self._store_result,
+                                         format_result=lambda value: format_int_result(value, fmt))
+            except JobQueueFullError as e:
+                return {"error": str(e)}, 503
             return {
-                "status": "error",
-                "message": str(e)
+                "status": "accepted",
+                "enclave_id": self.enclave_id,
+                "input": n,
+                "job_id": job_id,
+                "timestamp": int(time.time())
             }
+        
+        # Calculate Fibonacci number
+        result = self.calculate_fibonacci(n)
+        
+        # Convert result to bytes and store it for later use
+        self.result = result_to_bytes(result)
+        
+        # Create response for the client
+        response = {
+            "status": "success",
+            "enclave_id": self.enclave_id,
+            "input": n,
+            "timestamp": int(time.time())
+        }
+        
+        # Big results go out as hex/base64 of the stored bytes (linear time) with a digest;
+        # fetch them in chunks from /settlement when they are too large for one response
+        if fmt == "int" and result.bit_length() <= MAX_INT_RESULT_BITS:
+            response["result"] = result
+        else:
+            response.update(self.encode_result_bytes(self.result, encoding="base64" if fmt == "base64" else "hex"))
+        
+        return response
 
 if __name__ == '__main__':
     # Get environment setup from command line argument
@@ -0,0 +1,95 @@
+"""Throughput benchmark for enclave result signing.
+
+Signs the same payload repeatedly and reports, per secp256k1 backend:
+- signer: EthSigner built once per key (what KmsService.sign_data uses)
+- per-call key: the previous path, rebuilding an eth_keys PrivateKey and
+  re-splitting r/s/v for every signature (baseline)
+
+Every signature is checked to recover to the signing key's address.
+
+Usage:
+    python bench/bench_signing.py [--seconds S] [--payload-bytes N] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'enclave'))
+
+from eth_keys import keys  # noqa: E402
+from eth_utils import keccak  # noqa: E402
+
+from eth_signer import EthSigner, available_backends  # noqa: E402
+
+
+def _per_call_sign(private_bytes, data):
+    """The pre-EthSigner signing path, kept as the baseline"""
+    signature = keys.PrivateKey(private_bytes).sign_msg_hash(keccak(data)).to_bytes()
+    r, s, v = signature[:32], signature[32:64], signature[64:]
+    v_int = int.from_bytes(v, byteorder='big')
+    return r + s + bytes([v_int + 27]) if v_int <= 1 else signature
+
+
+def _bench(sign, data, seconds):
+    """Sign for about `seconds` and return throughput and latency stats"""
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        signature = sign(data)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return signature, {
+        'signatures': len(samples),
+        'per_second': round(len(samples) / (sum(samples) / 1e6), 1),
+        'median_us': round(statistics.median(samples), 2),
+        'p99_us': round(sorted(samples)[int(len(samples) * 0.99) - 1], 2),
+    }
+
+
+def _recovers_to(signature, data, address):
+    sig = keys.Signature(signature[:64] + bytes([signature[64] - 27]))
+    return sig.recover_public_key_from_msg_hash(keccak(data)).to_checksum_address() == address
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time spent per case')
+    parser.add_argument('--payload-bytes', type=int, default=256, help='Size of the signed payload')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    private_bytes = os.urandom(32)
+    address = keys.PrivateKey(private_bytes).public_key.to_checksum_address()
+    data = os.urandom(args.payload_bytes)
+
+    cases = {}
+    signature, cases['per-call key (eth_keys)'] = _bench(lambda d: _per_call_sign(private_bytes, d), data, args.seconds)
+    assert _recovers_to(signature, data, address)
+    for backend in available_backends():
+        signer = EthSigner(private_bytes, backend=backend)
+        signature, cases[f'signer ({backend})'] = _bench(signer.sign, data, args.seconds)
+        assert _recovers_to(signature, data, address), backend
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backends': available_backends(),
+        # eth_keys itself delegates to coincurve when it is installed
+        'eth_keys_backend': type(keys.backend).__name__,
+        'payload_bytes': args.payload_bytes,
+        'cases': cases,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('attestation-batcher')
+
+class _Batch:
+    """Verifier nonces collected for one attestation"""
+
+    __slots__ = ("nonces", "full", "done", "result", "error")
+
+    def __init__(self):
+        self.nonces = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class AttestationBatcher:
+    """
+    Serve many nonce-bound attestation requests with one attestation.
+
+    The first nonce opens a batch; nonces arriving within `window` seconds
+    (or until `max_batch` nonces) join it. The batch's nonces become the
+    leaves of a Merkle tree (see merkle.py) and one attestation is generated
+    with the tree root as its nonce. Each verifier gets the document plus
+    the inclusion proof of its own nonce under that root.
+    """
+
+    def __init__(self, generate, window=None, max_batch=None):
+        """
+        Initialize the batcher
+
+        Args:
+            generate (callable): Called as generate(nonce=root) and returns the document
+            window (float, optional): Seconds a batch stays open.
+                Defaults to ATTESTATION_BATCH_WINDOW_MS / 1000 or 0.05.
+            max_batch (int, optional): Nonces per batch before it closes early.
+                Defaults to ATTESTATION_BATCH_MAX or 1024.
+        """
+        self._generate = generate
+        self.window = window if window is not None else int(os.environ.get('ATTESTATION_BATCH_WINDOW_MS', 50)) / 1000
+        self.max_batch = max_batch or int(os.environ.get('ATTESTATION_BATCH_MAX', 1024))
+        self._lock = threading.Lock()
+        self._batch = None
+        self.batches = 0
+        self.nonces = 0
+
+    def attest(self, nonce):
+        """
+        Get an attestation whose nonce commits to `nonce`
+
+        Args:
+            nonce (bytes): The verifier's nonce
+
+        Returns:
+            dict: "attestation_doc" (bytes), "root", "leaf" and "proof" (bytes and
+                list of bytes), "index" and "batch_size"
+
+        Raises:
+            Exception: Whatever the generator raised, for every verifier in the batch
+        """
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            index = len(batch.nonces)
+            batch.nonces.append(nonce)
+            if len(batch.nonces) >= self.max_batch:
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            self._run(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        levels, attestation_doc = batch.result
+
+        import merkle
+        return {
+            "attestation_doc": attestation_doc,
+            "root": levels[-1][0],
+            "leaf": levels[0][index],
+            "proof": merkle.get_proof(levels, index),
+            "index": index,
+            "batch_size": len(levels[0])
+        }
+
+    def _run(self, batch):
+        """Close the batch after the window and attest its Merkle root"""
+        import merkle
+
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+            nonces = list(batch.nonces)
+            self.batches += 1
+            self.nonces += len(nonces)
+
+        try:
+            levels = merkle.build_tree([merkle.leaf_hash(nonce) for nonce in nonces])
+            batch.result = (levels, self._generate(nonce=levels[-1][0]))
+            logger.info(f"Attested a batch of {len(nonces)} nonces")
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def stats(self):
+        """Return the number of batches and nonces attested"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "nonces": self.nonces,
+                "window_ms": round(self.window * 1000, 3),
+                "max_batch": self.max_batch
+            }
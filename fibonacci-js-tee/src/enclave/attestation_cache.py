@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('attestation-cache')
+
+class _Flight:
+    """A single in-progress attestation generation shared by concurrent callers"""
+
+    __slots__ = ("event", "doc", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.doc = None
+        self.error = None
+
+class AttestationCache:
+    """
+    TTL cache with single-flight coalescing for attestation documents.
+
+    A cached document is served until it is `ttl` seconds old. On a miss, the
+    first caller generates a new document while concurrent callers wait for
+    that same generation instead of starting their own.
+    """
+
+    def __init__(self, generate, ttl=None):
+        """
+        Initialize the attestation cache
+
+        Args:
+            generate (callable): Produces a new attestation document (bytes)
+            ttl (float, optional): Seconds a document is served from cache.
+                Defaults to ATTESTATION_CACHE_TTL or 60; 0 disables caching
+                but keeps coalescing of concurrent requests.
+        """
+        self._generate = generate
+        self.ttl = float(ttl if ttl is not None else os.environ.get('ATTESTATION_CACHE_TTL', 60))
+        self._lock = threading.Lock()
+        self._doc = None
+        self._generated_at = 0.0
+        self._flight = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self):
+        """
+        Get an attestation document, generating one if the cached one expired
+
+        Returns:
+            bytes: The attestation document
+
+        Raises:
+            Exception: Whatever the generator raised, for the leader and all waiters
+        """
+        with self._lock:
+            if self._doc is not None and time.monotonic() - self._generated_at < self.ttl:
+                self.hits += 1
+                return self._doc
+
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.doc
+
+        try:
+            flight.doc = self._generate()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.doc:
+                    self._doc = flight.doc
+                    self._generated_at = time.monotonic()
+                self._flight = None
+            flight.event.set()
+        return flight.doc
+
+    def age(self):
+        """Return the age of the cached document in seconds, or None if there is none"""
+        with self._lock:
+            if self._doc is None:
+                return None
+            return time.monotonic() - self._generated_at
+
+    def invalidate(self):
+        """Drop the cached document so the next request generates a new one"""
+        with self._lock:
+            self._doc = None
+
+    def stats(self):
+        """Return hit, miss, coalesced and age metrics"""
+        age = self.age()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "ttl_seconds": self.ttl
+            }
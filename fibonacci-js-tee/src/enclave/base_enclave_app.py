@@ -14,14 +14,41 @@ import uuid
 import hashlib
 import random
 import string
+import contextlib
+from collections import OrderedDict
 
-from kms_service import create_kms_service
-from parent_connector import create_server_connector
+from startup_profile import profile
+
+with profile.phase("import:enclave modules"):
+    from kms_service import create_kms_service
+    from parent_connector import create_server_connector
+    from job_manager import JobManager, JobQueueFullError
+    from session_store import SessionStore
+    from router import Router
+    from attestation_cache import AttestationCache
+    from attestation_batcher import AttestationBatcher
+    from metrics import MetricsRegistry
+    from init_stream import InitStreamStore, InitStreamError
+    import state_snapshot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('enclave-base')
 
+# Descriptions of the PCRs shown by /formatted-attest
+PCR_DESCRIPTIONS = {
+    "0": "BIOS/firmware measurement",
+    "1": "Platform configuration",
+    "2": "Kernel and boot modules",
+    "4": "Application code and data"
+}
+
+# Batch roots are signed as keccak256(domain || root), never as a bare root, so a
+# batch signature can't pass for a /settlement signature (keccak256(result)).
+# Caller-supplied items get their own domain so they can't pass for computed results.
+SIGN_BATCH_RESULTS_DOMAIN = b"\x19sparsity-batch-root:results"
+SIGN_BATCH_ITEMS_DOMAIN = b"\x19sparsity-batch-root:items"
+
 class BaseEnclaveApp:
     """
     Base class for enclave applications that provides common functionality
@@ -36,8 +63,10 @@ class BaseEnclaveApp:
     - ParentConnector: Communication details (protocol-specific)
     - KmsService: Cryptography and KMS operations (environment-specific)
     
-    Subclasses can extend this by overriding the get_custom_handler method
-    to add support for custom endpoints and application-specific behavior.
+    Subclasses add endpoints by overriding register_routes and registering
+    handlers on the router (calling super() to keep the standard endpoints).
+    The older get_custom_handler hook is still consulted for endpoints that
+    no route matches.
     """
     
     def __init__(self, env_setup=None):
@@ -51,7 +80,8 @@ class BaseEnclaveApp:
         # Print startup information
         logger.info("=== Enclave Application Initializing ===")
         logger.info(f"Python version: {sys.version}")
-        logger.info(f"Environment variables: {dict(os.environ)}")
+        # Names only: values include AWS credentials
+        logger.debug(f"Environment variables: {sorted(os.environ)}")
 
         # Store environment setup
         self.env_setup = env_setup or os.environ.get('ENV_SETUP', 'NITRO')
@@ -78,11 +108,58 @@ class BaseEnclaveApp:
         self.debug_mode = os.environ.get('DEBUG', 'false').lower() in ('true', '1', 'yes')
         
         # Create services based on environment
-        self.connector, self.kms_service = self._create_services()
+        with profile.phase("init:services"):
+            self.connector, self.kms_service = self._create_services()
+        
+        # Runtime metrics served by /metrics; KMS operations are timed from here on
+        self.metrics = MetricsRegistry()
+        with profile.phase("init:metrics"):
+            self.init_metrics()
+
+        # Attestation documents are cached for ATTESTATION_CACHE_TTL seconds and
+        # concurrent requests share a single generation
+        self.attestation_cache = AttestationCache(self.kms_service.generate_attestation) if self.kms_service else None
+        
+        # Nonce-bound attestations requested with "batch": true share one attestation
+        # over the Merkle root of the nonces collected in ATTESTATION_BATCH_WINDOW_MS
+        self.attestation_batcher = AttestationBatcher(self.kms_service.generate_attestation) if self.kms_service else None
+        
+        # Formatted /formatted-attest views keyed by document digest
+        self._formatted_attestations = OrderedDict()
+        self._formatted_attestation_lock = threading.Lock()
+        self.formatted_attestation_cache_size = int(os.environ.get('FORMATTED_ATTESTATION_CACHE_SIZE', 16))
+        
+        # Process pool for long-running computations, polled through /jobs/<id>
+        self.jobs = JobManager()
+        
+        # Results are served in fixed-size chunks from /result/chunks/<offset>;
+        # /status inlines only results up to RESULT_INLINE_MAX_BYTES
+        self.result_chunk_size = int(os.environ.get('RESULT_CHUNK_SIZE', 64 * 1024))
+        self.result_inline_max_bytes = int(os.environ.get('RESULT_INLINE_MAX_BYTES', 1024 * 1024))
+        
+        # Chunked, encrypted /initialize/stream uploads in progress
+        self.init_streams = InitStreamStore()
+        
+        # Sealing key reused for every snapshot of this boot, and the state
+        # fingerprint of the last snapshot, so unchanged state isn't re-sealed
+        self._sealing_key = None
+        self._snapshot_fingerprint = None
+        self._snapshot_lock = threading.Lock()
+        
+        # Per-session state. `result` and `init_data` resolve to the session of the
+        # request being handled (or the default session outside of a request)
+        self.sessions = SessionStore()
+        self._session_local = threading.local()
+        
+        # Route registry; every route is timed and counted
+        self.router = Router()
+        with profile.phase("init:routes"):
+            self.register_routes(self.router)
         
         # Set up the request handler in the connector
         if self.connector:
-            self.connector.request_handler = self.handle_request
+            self.connector.request_handler = self._dispatch_request
+            self.connector.metrics = self.metrics
             logger.info("Set up request handler in connector")
             
         # Initialize cryptography components
@@ -90,7 +167,92 @@ class BaseEnclaveApp:
         self.signing_public_key_pem = ""
         self.result = None  # Initialize result as None
         self.init_data = None  # Initialize init_data as None
-        self.init_crypto()
+        with profile.phase("init:crypto"):
+            self.init_crypto()
+        
+        # Boot time breakdown, only collected with STARTUP_PROFILE=1
+        self.startup_report = profile.report()
+    
+    @property
+    def current_session(self):
+        """The session of the request being handled on this thread"""
+        return getattr(self._session_local, 'session', None) or self.sessions.default_session
+    
+    @contextlib.contextmanager
+    def session_context(self, session):
+        """Make `session` the current session on this thread for the duration of the block"""
+        previous = getattr(self._session_local, 'session', None)
+        self._session_local.session = session
+        try:
+            yield session
+        finally:
+            self._session_local.session = previous
+    
+    def _dispatch_request(self, request_data):
+        """
+        Connector entry point: scope the request to its session, then handle it
+        
+        The session is selected by the optional "session_id" field of the request data.
+        """
+        session_id = None
+        if isinstance(request_data, dict) and isinstance(request_data.get("data"), dict):
+            session_id = request_data["data"].get("session_id")
+        with self.session_context(self.sessions.get(session_id)):
+            return self.handle_request(request_data)
+    
+    @property
+    def result(self):
+        """The current session's settlement result (raw bytes), or None while computing"""
+        return self.current_session.result
+    
+    @result.setter
+    def result(self, value):
+        # Bump the version and drop the cached signed settlement atomically
+        session = self.current_session
+        with session.lock:
+            session.result = value
+            session.result_version += 1
+            session.settlement_cache = None
+            session.status_snapshot = None
+            session.result_manifest = None
+    
+    @property
+    def init_data(self):
+        """The current session's initialization data"""
+        return self.current_session.init_data
+    
+    @init_data.setter
+    def init_data(self, value):
+        session = self.current_session
+        with session.lock:
+            session.init_data = value
+            session.init_version += 1
+    
+    def get_signed_settlement(self):
+        """
+        Get the signed settlement for the current session's result
+        
+        The signature and encodings are computed once per result version and then
+        served from memory until the result changes.
+        
+        Returns:
+            dict: version, raw result, base64 result, digest and base64 signature,
+                or None if there is no result yet
+        """
+        session = self.current_session
+        with session.lock:
+            if session.settlement_cache is None and session.result is not None:
+                result = session.result
+                session.settlement_cache = {
+                    "version": session.result_version,
+                    "result": result,
+                    "result_b64": base64.b64encode(result).decode('utf-8'),
+                    "result_digest": hashlib.sha256(result).hexdigest(),
+                    "signature": base64.b64encode(self.sign_data(result)).decode('utf-8')
+                }
+                logger.info(f"Signed settlement for session {session.session_id} "
+                            f"result version {session.result_version}")
+            return session.settlement_cache
     
     def _create_services(self):
         """
@@ -101,10 +263,12 @@ class BaseEnclaveApp:
         """
         try:
             # Create the connector
-            connector = create_server_connector(self.env_setup)
+            with profile.phase("init:connector"):
+                connector = create_server_connector(self.env_setup)
             
             # Create the KMS service
-            kms_service = create_kms_service(self.env_setup)
+            with profile.phase("init:kms"):
+                kms_service = create_kms_service(self.env_setup)
             
             return connector, kms_service
         except Exception as e:
@@ -163,6 +327,20 @@ class BaseEnclaveApp:
         logger.warning("No KMS service available for signing, using placeholder")
         return b"signing_service_unavailable"
     
+    def decrypt_many(self, ciphertexts):
+        """
+        Decrypt a batch of ECIES ciphertexts addressed to the enclave key
+        
+        Args:
+            ciphertexts (list): The ciphertexts (bytes)
+            
+        Returns:
+            list: One entry per ciphertext: {"plaintext": bytes} or {"error": str}
+        """
+        if not self.kms_service:
+            return [{"error": "KMS service not available"} for _ in ciphertexts]
+        return self.kms_service.decrypt_many(ciphertexts)
+    
     def secure_hash(self, data):
         """Create a secure hash of data"""
         if isinstance(data, dict):
@@ -171,34 +349,252 @@ class BaseEnclaveApp:
             data = str(data).encode('utf-8')
         return hashlib.sha256(data).hexdigest()
     
+    def encode_result_bytes(self, raw_bytes, encoding="base64", offset=0, chunk_size=None, digest=None):
+        """
+        Encode a (possibly large) binary result for a JSON response in linear time
+        
+        Args:
+            raw_bytes (bytes): The full result
+            encoding (str): "base64" or "hex"
+            offset (int): Start of the chunk to return when chunk_size is set
+            chunk_size (int, optional): Return only raw_bytes[offset:offset + chunk_size]
+            digest (str, optional): Precomputed SHA-256 hex digest of raw_bytes
+            
+        Returns:
+            dict: Response fields with the encoded result (or chunk), the total
+                length and a SHA-256 digest of the full result
+                
+        Raises:
+            ValueError: If chunk_size is not a positive integer or offset is
+                not a non-negative integer
+        """
+        total = len(raw_bytes)
+        if chunk_size is not None:
+            try:
+                offset, chunk_size = int(offset), int(chunk_size)
+            except (TypeError, ValueError):
+                raise ValueError("offset and chunk_size must be integers")
+            if chunk_size <= 0 or offset < 0:
+                raise ValueError("chunk_size must be positive and offset non-negative")
+            offset = min(offset, total)
+            end = min(total, offset + chunk_size)
+        else:
+            offset, end = 0, total
+        chunk = raw_bytes[offset:end]
+        
+        fields = {
+            "encoding": encoding,
+            "result": chunk.hex() if encoding == "hex" else base64.b64encode(chunk).decode('utf-8'),
+            "result_length": total,
+            "result_digest": digest or hashlib.sha256(raw_bytes).hexdigest()
+        }
+        if chunk_size is not None:
+            fields["offset"] = offset
+            fields["next_offset"] = end
+            fields["done"] = end >= total
+        return fields
+    
     def generate_random_nonce(self, length=16):
         """Generate a random nonce for attestation"""
         return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
     
-    def handle_status_request(self, data):
-        """Handle a status request"""
-        status = "completed" if self.result is not None else "running"
+    def get_status_snapshot(self):
+        """
+        Get the signed status snapshot for the current session
+        
+        A snapshot is built and signed once per result version; polls in between
+        are served from memory. Its "timestamp" is the time the snapshot was taken.
+        
+        Returns:
+            dict: The snapshot fields plus "signature" over all other fields
+        """
+        session = self.current_session
+        with session.lock:
+            if session.status_snapshot is None:
+                result = session.result
+                snapshot = {
+                    "status": "success",
+                    "computation_status": "completed" if result is not None else "running",
+                    "timestamp": int(time.time()),
+                    "debug_mode": self.debug_mode,
+                    "enclave_id": self.enclave_id,
+                    "session_id": session.session_id,
+                    "version": session.result_version,
+                    # Include result if available
+                    "result": base64.b64encode(result).decode('utf-8') if result else ""
+                }
+                if result and len(result) > self.result_inline_max_bytes:
+                    # Too large to inline: fetch it through /result/manifest and /result/chunks
+                    snapshot["result"] = ""
+                    snapshot["chunked"] = True
+                    snapshot["result_length"] = len(result)
+                    snapshot["result_digest"] = hashlib.sha256(result).hexdigest()
+                payload = json.dumps(snapshot, sort_keys=True)
+                snapshot["etag"] = self.secure_hash(payload)
+                snapshot["signature"] = base64.b64encode(self.sign_data(payload)).decode('utf-8')
+                session.status_snapshot = snapshot
+            return session.status_snapshot
+    
+    def get_result_manifest(self):
+        """
+        Get the signed chunk manifest for the current session's result
+        
+        The result is split into chunks of result_chunk_size bytes; chunk i starts
+        at offset i * chunk_size. The manifest lists each chunk's offset, length
+        and SHA-256 digest and is built and signed once per result version.
+        
+        Returns:
+            dict: The manifest plus "signature" over all other fields, or None
+                if there is no result yet
+        """
+        session = self.current_session
+        with session.lock:
+            result = session.result
+            if session.result_manifest is None and result is not None:
+                chunk_size = self.result_chunk_size
+                view = memoryview(result)
+                manifest = {
+                    "session_id": session.session_id,
+                    "version": session.result_version,
+                    "result_length": len(result),
+                    "result_digest": hashlib.sha256(view).hexdigest(),
+                    "chunk_size": chunk_size,
+                    "chunk_count": -(-len(result) // chunk_size),
+                    "chunks": [
+                        {
+                            "offset": offset,
+                            "length": min(chunk_size, len(result) - offset),
+                            "sha256": hashlib.sha256(view[offset:offset + chunk_size]).hexdigest()
+                        }
+                        for offset in range(0, len(result), chunk_size)
+                    ]
+                }
+                payload = json.dumps(manifest, sort_keys=True)
+                manifest["signature"] = base64.b64encode(self.sign_data(payload)).decode('utf-8')
+                session.result_manifest = manifest
+            return session.result_manifest
+    
+    def handle_result_manifest_request(self, data):
+        """
+        Handle a request for the current session's result chunk manifest
         
-        response = {
+        Args:
+            data (dict): Request data (unused)
+            
+        Returns:
+            dict: Response containing the signed manifest
+        """
+        manifest = self.get_result_manifest()
+        if manifest is None:
+            return {
+                "status": "error",
+                "message": "No result available yet"
+            }, 404
+        
+        return {
             "status": "success",
-            "computation_status": status,
-            "timestamp": int(time.time()),
-            "debug_mode": self.debug_mode,
-            "enclave_id": self.enclave_id
+            "manifest": manifest
         }
+    
+    def handle_result_chunk_request(self, data, offset):
+        """
+        Handle a request for one result chunk
         
-        # Include result if available
-        response["result"] = base64.b64encode(self.result).decode('utf-8') if self.result else ""
-        response["signature"] = base64.b64encode(self.sign_data(json.dumps(response, sort_keys=True))).decode('utf-8')
+        Args:
+            data (dict): Request data with optional "version" (the manifest version
+                the client is reading) and "encoding" ("base64" or "hex")
+            offset (int): Chunk offset from the path; must be a multiple of the chunk size
             
-        return response
+        Returns:
+            dict: Response containing the chunk and its SHA-256 digest
+        """
+        if not isinstance(data, dict):
+            data = {}
+        
+        # Read the manifest and the result it was built from together
+        session = self.current_session
+        with session.lock:
+            manifest = self.get_result_manifest()
+            result = session.result
+        if manifest is None:
+            return {
+                "status": "error",
+                "message": "No result available yet"
+            }, 404
+        
+        # Chunks of different result versions must not be mixed
+        version = data.get("version")
+        if version is not None and str(version) != str(manifest["version"]):
+            return {
+                "status": "error",
+                "message": f"Result changed: version {manifest['version']}, requested {version}",
+                "version": manifest["version"]
+            }, 409
+        
+        chunk_size = manifest["chunk_size"]
+        if offset < 0 or offset % chunk_size or offset >= manifest["result_length"]:
+            return {
+                "status": "error",
+                "message": f"Invalid chunk offset {offset} for chunk size {chunk_size}"
+            }, 400
+        
+        entry = manifest["chunks"][offset // chunk_size]
+        chunk = result[offset:offset + entry["length"]]
+        encoding = data.get("encoding", "base64")
+        
+        return {
+            "status": "success",
+            "version": manifest["version"],
+            "offset": offset,
+            "length": entry["length"],
+            "sha256": entry["sha256"],
+            "next_offset": offset + entry["length"] if offset + entry["length"] < manifest["result_length"] else None,
+            "encoding": encoding,
+            "data": chunk.hex() if encoding == "hex" else base64.b64encode(chunk).decode('utf-8')
+        }
+    
+    def handle_status_request(self, data):
+        """
+        Handle a status request
+        
+        Clients that already hold a snapshot can send its "version" as "if_version"
+        or its "etag" as "if_none_match"; if it is still current, a small
+        "not_modified" response is returned instead of the full signed snapshot.
+        
+        Args:
+            data (dict): Request data with optional "if_version" / "if_none_match"
+            
+        Returns:
+            dict: The signed status snapshot, or a not-modified marker
+        """
+        snapshot = self.get_status_snapshot()
+        
+        if isinstance(data, dict):
+            if_version = data.get("if_version")
+            if_none_match = data.get("if_none_match")
+            if (if_version is not None and str(if_version) == str(snapshot["version"])) or \
+                    (if_none_match is not None and if_none_match == snapshot["etag"]):
+                return {
+                    "status": "not_modified",
+                    "session_id": snapshot["session_id"],
+                    "version": snapshot["version"],
+                    "etag": snapshot["etag"]
+                }
+        
+        return snapshot
     
     def handle_attestation_request(self, data):
         """
         Handle a request for attestation document
         
+        Without a nonce or user data the cached document is returned. A "nonce"
+        (string, bound as its UTF-8 bytes) or "user_data" (base64) is bound into
+        a fresh document. With "batch": true, the nonce is instead attested
+        together with other verifiers' nonces: the document's nonce is their
+        Merkle root and the response carries this nonce's inclusion proof.
+        
         Args:
-            data (dict): Request data containing an optional nonce
+            data (dict): Request data containing an optional nonce, user_data and batch flag
             
         Returns:
             dict: Response containing the attestation document
@@ -213,8 +609,36 @@ class BaseEnclaveApp:
                     "message": "KMS service not available"
                 }, 500
             
-            # Get attestation document from NSM
-            attestation_doc = self.kms_service.generate_attestation()
+            if not isinstance(data, dict):
+                data = {}
+            nonce = data.get("nonce")
+            nonce = nonce.encode('utf-8') if isinstance(nonce, str) and nonce else None
+            try:
+                user_data = base64.b64decode(data["user_data"], validate=True) if data.get("user_data") else None
+            except (TypeError, ValueError) as e:
+                return {
+                    "status": "error",
+                    "message": f"Invalid user_data: {e}"
+                }, 400
+            
+            nonce_proof = None
+            if data.get("batch") and nonce is not None and user_data is None:
+                # One attestation over the Merkle root of the batched nonces
+                batched = self.attestation_batcher.attest(nonce)
+                attestation_doc = batched["attestation_doc"]
+                nonce_proof = {
+                    "root": "0x" + batched["root"].hex(),
+                    "leaf": "0x" + batched["leaf"].hex(),
+                    "proof": ["0x" + node.hex() for node in batched["proof"]],
+                    "index": batched["index"],
+                    "batch_size": batched["batch_size"]
+                }
+            elif nonce is not None or user_data is not None:
+                # Bound to this request: never served from or stored in the cache
+                attestation_doc = self.kms_service.generate_attestation(nonce=nonce, user_data=user_data)
+            else:
+                # Get attestation document from NSM (cached, single-flight)
+                attestation_doc = self.attestation_cache.get()
             if not attestation_doc:
                 return {
                     "status": "error",
@@ -232,6 +656,8 @@ class BaseEnclaveApp:
                     "enclave_id": self.enclave_id
                 }
             }
+            if nonce_proof:
+                response["attestation"]["nonce_proof"] = nonce_proof
             
             return response
             
@@ -243,13 +669,27 @@ class BaseEnclaveApp:
                 "message": str(e)
             }, 500
     
-    def generate_attestation(self, nonce=None):
+    def handle_attestation_cache_request(self, data):
+        """Handle a request for attestation cache hit, miss and age metrics"""
+        if not self.attestation_cache:
+            return {
+                "status": "error",
+                "message": "KMS service not available"
+            }, 500
+        return {
+            "status": "success",
+            "attestation_cache": self.attestation_cache.stats(),
+            "attestation_batches": self.attestation_batcher.stats()
+        }
+    
+    def generate_attestation(self, nonce=None, user_data=None):
         """
         Generate an attestation document with the provided nonce
         
         Args:
             nonce (str, optional): A nonce to include in the attestation document.
                 If not provided, a random nonce will be generated.
+            user_data (bytes, optional): User data to include in the attestation document.
                 
         Returns:
             dict: The attestation document and related information.
@@ -260,7 +700,7 @@ class BaseEnclaveApp:
         
         # Delegate attestation generation to the KMS service
         if hasattr(self, 'kms_service') and self.kms_service:
-            return self.kms_service.generate_attestation(nonce=nonce)
+            return self.kms_service.generate_attestation(nonce=nonce, user_data=user_data)
         
         # If KMS service is not available, return an error
         logger.error("No attestation generation capability available")
@@ -286,8 +726,8 @@ class BaseEnclaveApp:
                     "message": "KMS service not available"
                 }, 500
             
-            # Get attestation document from NSM
-            attestation_doc = self.kms_service.generate_attestation()
+            # Get attestation document from NSM (cached, single-flight)
+            attestation_doc = self.attestation_cache.get()
             if not attestation_doc:
                 return {
                     "status": "error",
@@ -295,60 +735,8 @@ class BaseEnclaveApp:
                 }, 500
             
             try:
-                # Import cbor2 library for parsing attestation document
-                import cbor2
-                import json
-                
-                # Parse and format the attestation document
-                def parse_attestation_doc(attestation_doc):
-                    # Decode CBOR attestation document
-                    data = cbor2.loads(attestation_doc)
-                    
-                    # Load and decode document payload (position 2 contains the document)
-                    doc = data[2]
-                    doc_obj = cbor2.loads(doc)
-                    
-                    # Format the document for readability
-                    formatted_doc = {
-                        # PCR measurements with descriptive comments
-                        "pcrs": {
-                            str(idx): {
-                                "value": val.hex() if isinstance(val, bytes) else val,
-                                "description": {
-                                    "0": "BIOS/firmware measurement",
-                                    "1": "Platform configuration",
-                                    "2": "Kernel and boot modules",
-                                    "4": "Application code and data"
-                                }.get(str(idx), "Unused PCR")
-                            }
-                            for idx, val in doc_obj.get('pcrs', {}).items()
-                        },
-                        
-                        # Certificate information
-                        "certificate": base64.b64encode(doc_obj.get('certificate', b'')).decode('utf-8') if isinstance(doc_obj.get('certificate', b''), bytes) else None,
-                        "cabundle": [cert.hex() for cert in doc_obj.get('cabundle', [])] if 'cabundle' in doc_obj else None,
-                        
-                        # Public key for verification
-                        "public_key": base64.b64encode(doc_obj.get('public_key', b'')).decode('utf-8') if isinstance(doc_obj.get('public_key', b''), bytes) else None,
-                        
-                        # Timestamp and metadata
-                        "timestamp": doc_obj.get('timestamp', 0),
-                        "timestamp_formatted": time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(doc_obj.get('timestamp', 0)/1000)),
-                        
-                        # Optional fields
-                        "nonce": doc_obj.get('nonce', b'').decode('utf-8') if isinstance(doc_obj.get('nonce', b''), bytes) else None,
-                        "user_data": doc_obj.get('user_data', b'').decode('utf-8') if isinstance(doc_obj.get('user_data', b''), bytes) else None
-                    }
-                    
-                    return formatted_doc
-                
-                # Get formatted document
-                formatted_doc = parse_attestation_doc(attestation_doc)
-                
-                # Log successful parsing
-                active_pcrs = [idx for idx, data in formatted_doc['pcrs'].items() 
-                             if data['value'] != "0"*96]  # 96 is the length of a zero PCR value
-                logger.info(f"Successfully parsed attestation document. Active PCRs: {active_pcrs}")
+                # Parsed once per distinct document, then served from the cache
+                formatted_doc = self.format_attestation_doc(attestation_doc)
                 
                 return {
                     "status": "success",
@@ -377,6 +765,83 @@ class BaseEnclaveApp:
                 "message": str(e)
             }, 500
     
+    def format_attestation_doc(self, attestation_doc):
+        """
+        Get the human-readable view of an attestation document
+        
+        Views are cached by the SHA-256 digest of the document in a bounded LRU
+        cache, so repeat requests for the same document skip the CBOR decode and
+        the certificate hex expansion.
+        
+        Args:
+            attestation_doc (bytes): The COSE_Sign1 attestation document
+            
+        Returns:
+            dict: The formatted attestation document
+        """
+        digest = hashlib.sha256(attestation_doc).hexdigest()
+        with self._formatted_attestation_lock:
+            formatted_doc = self._formatted_attestations.get(digest)
+            if formatted_doc is not None:
+                self._formatted_attestations.move_to_end(digest)
+                return formatted_doc
+        
+        formatted_doc = self._parse_attestation_doc(attestation_doc)
+        
+        # Log successful parsing
+        active_pcrs = [idx for idx, data in formatted_doc['pcrs'].items() 
+                     if data['value'] != "0"*96]  # 96 is the length of a zero PCR value
+        logger.info(f"Successfully parsed attestation document. Active PCRs: {active_pcrs}")
+        
+        with self._formatted_attestation_lock:
+            self._formatted_attestations[digest] = formatted_doc
+            while len(self._formatted_attestations) > self.formatted_attestation_cache_size:
+                self._formatted_attestations.popitem(last=False)
+        return formatted_doc
+    
+    def _parse_attestation_doc(self, attestation_doc):
+        """Decode a COSE_Sign1 attestation document into its formatted view"""
+        # Import cbor2 library for parsing attestation document
+        import cbor2
+        
+        # Decode CBOR attestation document; the mock tags it as COSE_Sign1 (18), NSM does not
+        data = cbor2.loads(attestation_doc)
+        if isinstance(data, cbor2.CBORTag):
+            data = data.value
+        
+        # Load and decode document payload (position 2 contains the document)
+        doc = data[2]
+        doc_obj = cbor2.loads(doc)
+        
+        # Format the document for readability
+        formatted_doc = {
+            # PCR measurements with descriptive comments
+            "pcrs": {
+                str(idx): {
+                    "value": val.hex() if isinstance(val, bytes) else val,
+                    "description": PCR_DESCRIPTIONS.get(str(idx), "Unused PCR")
+                }
+                for idx, val in doc_obj.get('pcrs', {}).items()
+            },
+            
+            # Certificate information
+            "certificate": base64.b64encode(doc_obj.get('certificate', b'')).decode('utf-8') if isinstance(doc_obj.get('certificate', b''), bytes) else None,
+            "cabundle": [cert.hex() for cert in doc_obj.get('cabundle', [])] if 'cabundle' in doc_obj else None,
+            
+            # Public key for verification
+            "public_key": base64.b64encode(doc_obj.get('public_key', b'')).decode('utf-8') if isinstance(doc_obj.get('public_key', b''), bytes) else None,
+            
+            # Timestamp and metadata
+            "timestamp": doc_obj.get('timestamp', 0),
+            "timestamp_formatted": time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(doc_obj.get('timestamp', 0)/1000)),
+            
+            # Optional fields
+            "nonce": doc_obj.get('nonce', b'').decode('utf-8') if isinstance(doc_obj.get('nonce', b''), bytes) else None,
+            "user_data": doc_obj.get('user_data', b'').decode('utf-8') if isinstance(doc_obj.get('user_data', b''), bytes) else None
+        }
+        
+        return formatted_doc
+    
     def initialize(self, raw_bytes):
         """
         Default initialize method that stores the raw bytes data.
@@ -401,7 +866,426 @@ class BaseEnclaveApp:
             logger.error(f"Error storing initialization data: {e}")
             logger.error(traceback.format_exc())
             return False
+    
+    def initialize_stream(self, stream, size, digest):
+        """
+        Initialize from a completed /initialize/stream upload
+        
+        The default reads the whole stream and calls initialize(). Apps with large
+        inputs override this to consume the stream incrementally, e.g.
+        `for block in iter(lambda: stream.read(1 << 20), b""): ...`. The stream is
+        closed after this returns, so anything kept must be read or copied first.
+        
+        Args:
+            stream (file): Binary file object with the decrypted, verified data
+            size (int): Size of the data in bytes
+            digest (str): SHA-256 of the data (hex)
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.initialize(stream.read())
 
+    def register_routes(self, router):
+        """
+        Register the endpoints served by this application
+        
+        Subclasses override this to add their own routes, calling super() to keep
+        the standard ones. Handlers are called as handler(data, **path_params).
+        
+        Example implementation in a derived class:
+        ```python
+        def register_routes(self, router):
+            super().register_routes(router)
+            router.add("/my-endpoint/<item_id>", self.handle_my_endpoint)
+        ```
+        
+        Args:
+            router (Router): The router to register routes on
+        """
+        # Settlement is served by the status handler unless an app overrides it
+        router.add("/status", self.handle_status_request)
+        router.add("/settlement", self.handle_status_request)
+        router.add("/result/manifest", self.handle_result_manifest_request)
+        router.add("/result/chunks/<int:offset>", self.handle_result_chunk_request)
+        router.add("/attest", self.handle_attestation_request)
+        router.add("/formatted-attest", self.handle_formatted_attestation_request)
+        router.add("/attestation-cache", self.handle_attestation_cache_request)
+        router.add("/initialize", self.handle_initialize_request)
+        router.add("/initialize/stream", self.handle_init_stream_open_request)
+        router.add("/initialize/stream/<upload_id>", self.handle_init_stream_status_request)
+        router.add("/initialize/stream/<upload_id>/chunks/<int:index>", self.handle_init_stream_chunk_request)
+        router.add("/jobs", self.handle_job_request)
+        router.add("/jobs/<job_id>", self.handle_job_request)
+        router.add("/routes", self.handle_route_stats_request)
+        router.add("/metrics", self.handle_metrics_request)
+        router.add("/startup", self.handle_startup_report_request)
+        router.add("/snapshot", self.handle_snapshot_request)
+        router.add("/restore", self.handle_restore_request)
+        router.add("/sign-batch", self.handle_sign_batch_request)
+    
+    def init_metrics(self):
+        """
+        Declare the built-in metrics and instrument the KMS service
+        
+        Sign, attest and decrypt calls are timed per operation. Connection and
+        thread gauges are read when /metrics is rendered, and route metrics
+        come from the router's own counters.
+        """
+        metrics = self.metrics
+        metrics.describe("enclave_kms_operation_seconds", "histogram", "KMS operation latency")
+        metrics.describe("enclave_kms_operation_errors_total", "counter", "Failed KMS operations")
+        metrics.describe("enclave_response_encode_seconds", "histogram", "Response serialization time per connector")
+        
+        if self.kms_service:
+            for operation, method_name in (("sign", "sign_data"), ("attest", "generate_attestation"), ("decrypt", "decrypt_data")):
+                metrics.instrument(self.kms_service, method_name, "enclave_kms_operation_seconds",
+                                   errors="enclave_kms_operation_errors_total", operation=operation)
+        
+        metrics.gauge("enclave_active_connections", "Connections currently being served",
+                      lambda: self.connector.active_connections if self.connector else 0)
+        metrics.gauge("enclave_threads", "Live Python threads", threading.active_count)
+        metrics.gauge("enclave_sessions", "Sessions in the session table", lambda: len(self.sessions))
+        metrics.gauge("enclave_init_uploads", "Initialization uploads in progress", lambda: self.init_streams.active())
+        metrics.add_collector(lambda: self.router.render_metrics())
+    
+    def handle_metrics_request(self, data):
+        """Handle a request for runtime metrics in the Prometheus text format"""
+        return self.metrics.render()
+    
+    def get_snapshot_state(self):
+        """
+        Collect the app state saved in sealed snapshots
+        
+        Subclasses with state of their own override this and apply_snapshot_state,
+        calling super() and adding JSON-serializable fields.
+        
+        Returns:
+            dict: Every session's init_data, result and result version
+        """
+        def encode(value):
+            return base64.b64encode(value).decode('utf-8') if value is not None else None
+        
+        sessions = []
+        for session in self.sessions.all():
+            with session.lock:
+                sessions.append({
+                    "session_id": session.session_id,
+                    "init_data": encode(session.init_data),
+                    "result": encode(session.result),
+                    "result_version": session.result_version
+                })
+        return {"sessions": sessions}
+    
+    def apply_snapshot_state(self, state):
+        """
+        Restore the state collected by get_snapshot_state
+        
+        Completed results are restored under a result version newer than both the
+        saved one and the session's current one. Sessions that were still computing
+        when the snapshot was taken are re-initialized from their init_data.
+        
+        Args:
+            state (dict): The unsealed snapshot state
+        """
+        for entry in state.get("sessions", []):
+            session = self.sessions.get(entry["session_id"])
+            init_data = base64.b64decode(entry["init_data"]) if entry.get("init_data") is not None else None
+            result = base64.b64decode(entry["result"]) if entry.get("result") is not None else None
+            
+            with self.session_context(session):
+                self.init_data = init_data
+                if result is not None:
+                    with session.lock:
+                        session.result = result
+                        # Always move past both the saved and the live version: clients may
+                        # already hold a settlement signed under either one
+                        session.result_version = max(session.result_version, entry.get("result_version", 0)) + 1
+                        session.settlement_cache = None
+                        session.status_snapshot = None
+                        session.result_manifest = None
+                elif init_data is not None:
+                    self.initialize(init_data)
+    
+    def snapshot_fingerprint(self):
+        """
+        Identify the snapshot state cheaply, without collecting it
+        
+        Subclasses with state of their own that changes independently of session
+        results and init data extend this, calling super().
+        
+        Returns:
+            tuple: Every session's id, result version and init data version
+        """
+        return tuple(
+            (session.session_id, session.result_version, session.init_version)
+            for session in self.sessions.all()
+        )
+    
+    def create_snapshot(self, if_changed=False):
+        """
+        Seal the app state for storage by the parent
+        
+        The state is encrypted with a sealing key from the KMS service. On Nitro
+        this is a KMS data key, so only an enclave allowed by the key policy
+        (e.g. one with the same PCRs) can restore it. One key is generated per
+        boot (or taken over from the restored snapshot) and reused, so periodic
+        snapshots don't each cost a KMS round trip.
+        
+        Args:
+            if_changed (bool): Return None instead of sealing when the state
+                fingerprint is unchanged since the last snapshot
+        
+        Returns:
+            dict: The sealed snapshot envelope, or None if unchanged
+        """
+        with self._snapshot_lock:
+            fingerprint = self.snapshot_fingerprint()
+            if if_changed and fingerprint == self._snapshot_fingerprint:
+                return None
+            if self._sealing_key is None:
+                self._sealing_key = self.kms_service.generate_sealing_key(self.aws_credentials)
+            key, key_blob = self._sealing_key
+            envelope = state_snapshot.seal(self.get_snapshot_state(), key, key_blob)
+            self._snapshot_fingerprint = fingerprint
+        logger.info(f"Created sealed snapshot of {len(self.sessions)} sessions")
+        return envelope
+    
+    def restore_snapshot(self, envelope):
+        """
+        Unseal a snapshot created by create_snapshot and restore its state
+        
+        Args:
+            envelope (dict): The sealed snapshot envelope
+            
+        Raises:
+            state_snapshot.SnapshotError: If the snapshot is malformed or fails authentication
+        """
+        if not isinstance(envelope, dict) or "key_blob" not in envelope:
+            raise state_snapshot.SnapshotError("Snapshot envelope is missing its key blob")
+        key = self.kms_service.unseal_key(envelope["key_blob"], self.aws_credentials)
+        state = state_snapshot.unseal(envelope, key)
+        with self._snapshot_lock:
+            self.apply_snapshot_state(state)
+            # The parent already holds this state, sealed under this key
+            self._sealing_key = (key, envelope["key_blob"])
+            self._snapshot_fingerprint = self.snapshot_fingerprint()
+        logger.info(f"Restored sealed snapshot from {envelope.get('created_at')}")
+    
+    def handle_snapshot_request(self, data):
+        """
+        Handle a request for a sealed snapshot of the app state
+        
+        Args:
+            data (dict): Request data; with "if_changed": true, nothing is sealed
+                when the state is unchanged since the last snapshot
+            
+        Returns:
+            dict: Response containing the sealed snapshot for the parent to store,
+                or "unchanged": true
+        """
+        if not self.kms_service:
+            return {
+                "status": "error",
+                "message": "KMS service not available"
+            }, 500
+        try:
+            if_changed = isinstance(data, dict) and bool(data.get("if_changed"))
+            envelope = self.create_snapshot(if_changed=if_changed)
+            if envelope is None:
+                return {
+                    "status": "success",
+                    "unchanged": True
+                }
+            return {
+                "status": "success",
+                "snapshot": envelope
+            }
+        except NotImplementedError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }, 501
+        except Exception as e:
+            logger.error(f"Error creating snapshot: {e}")
+            logger.error(traceback.format_exc())
+            return {
+                "status": "error",
+                "message": str(e)
+            }, 500
+    
+    def handle_restore_request(self, data):
+        """
+        Handle a request to restore app state from a sealed snapshot
+        
+        Args:
+            data (dict): Request data with the "snapshot" envelope
+            
+        Returns:
+            dict: Response indicating success or failure
+        """
+        if not self.kms_service:
+            return {
+                "status": "error",
+                "message": "KMS service not available"
+            }, 500
+        try:
+            self.restore_snapshot(data.get("snapshot") if isinstance(data, dict) else None)
+            return {
+                "status": "success",
+                "message": "Restored state from snapshot"
+            }
+        except state_snapshot.SnapshotError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }, 400
+        except NotImplementedError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }, 501
+        except Exception as e:
+            logger.error(f"Error restoring snapshot: {e}")
+            logger.error(traceback.format_exc())
+            return {
+                "status": "error",
+                "message": str(e)
+            }, 500
+    
+    def handle_startup_report_request(self, data):
+        """Handle a request for the boot time breakdown (STARTUP_PROFILE=1)"""
+        if self.startup_report is None:
+            return {
+                "status": "error",
+                "message": "Startup profiling is disabled; set STARTUP_PROFILE=1"
+            }, 404
+        return {
+            "status": "success",
+            "startup": self.startup_report
+        }
+    
+    def handle_route_stats_request(self, data):
+        """Handle a request for per-route request, error and latency counters"""
+        return {
+            "status": "success",
+            "routes": self.router.stats()
+        }
+    
+    def sign_batch(self, items, domain=SIGN_BATCH_RESULTS_DOMAIN):
+        """
+        Sign many items with a single signature over their Merkle root
+        
+        Leaves and nodes use keccak256 with sorted-pair hashing (see merkle.py),
+        so each item can be verified on chain with OpenZeppelin's MerkleProof
+        against the root. The signature covers keccak256(domain || root), so a
+        verifier checks ecrecover(keccak256(abi.encodePacked(domain, root)), sig)
+        and must pin the domain it expects.
+        
+        Args:
+            items (list): The items to sign (bytes)
+            domain (bytes): Domain tag; SIGN_BATCH_RESULTS_DOMAIN for enclave-held
+                results, SIGN_BATCH_ITEMS_DOMAIN for caller-supplied data
+            
+        Returns:
+            dict: Hex root and domain, base64 signature over domain || root, and
+                one {"index", "leaf", "proof"} entry per item with hex hashes
+        """
+        # Imported on first use: pulls in eth_utils
+        import merkle
+        
+        leaves = [merkle.leaf_hash(item) for item in items]
+        levels = merkle.build_tree(leaves)
+        root = levels[-1][0]
+        
+        return {
+            "root": "0x" + root.hex(),
+            "domain": "0x" + domain.hex(),
+            "signature": base64.b64encode(self.sign_data(domain + root)).decode('utf-8'),
+            "count": len(leaves),
+            "proofs": [
+                {
+                    "index": index,
+                    "leaf": "0x" + leaf.hex(),
+                    "proof": ["0x" + node.hex() for node in merkle.get_proof(levels, index)]
+                }
+                for index, leaf in enumerate(leaves)
+            ]
+        }
+    
+    def handle_sign_batch_request(self, data):
+        """
+        Handle a batch signing request
+        
+        Either "session_ids" (the sessions whose current results are signed, under
+        SIGN_BATCH_RESULTS_DOMAIN) or "items" (caller-supplied base64 strings, or
+        hex with "encoding": "hex", signed under SIGN_BATCH_ITEMS_DOMAIN) selects
+        the items. At most SIGN_BATCH_MAX_ITEMS items are accepted per request.
+        
+        Args:
+            data (dict): Request data with "items" or "session_ids"
+            
+        Returns:
+            dict: Response with the signed root and per-item inclusion proofs
+        """
+        if not isinstance(data, dict):
+            data = {}
+        max_items = int(os.environ.get('SIGN_BATCH_MAX_ITEMS', 4096))
+        
+        session_ids = None
+        try:
+            if "session_ids" in data:
+                session_ids = data["session_ids"]
+                if not isinstance(session_ids, list):
+                    raise TypeError("session_ids must be a list")
+                domain = SIGN_BATCH_RESULTS_DOMAIN
+                items = []
+                for session_id in session_ids:
+                    session = self.sessions.find(session_id)
+                    result = session.result if session else None
+                    if result is None:
+                        return {
+                            "status": "error",
+                            "message": f"No result for session {session_id}"
+                        }, 404
+                    items.append(result)
+            else:
+                raw_items = data.get("items", [])
+                if not isinstance(raw_items, list):
+                    raise TypeError("items must be a list")
+                domain = SIGN_BATCH_ITEMS_DOMAIN
+                if data.get("encoding", "base64") == "hex":
+                    items = [bytes.fromhex(item[2:] if item.startswith("0x") else item) for item in raw_items]
+                else:
+                    items = [base64.b64decode(item) for item in raw_items]
+        except (TypeError, ValueError, AttributeError) as e:
+            return {
+                "status": "error",
+                "message": f"Invalid batch items: {e}"
+            }, 400
+        
+        if not items:
+            return {
+                "status": "error",
+                "message": "No items to sign"
+            }, 400
+        if len(items) > max_items:
+            return {
+                "status": "error",
+                "message": f"Too many items: {len(items)} > {max_items}"
+            }, 400
+        
+        batch = self.sign_batch(items, domain)
+        if session_ids is not None:
+            for entry, session_id in zip(batch["proofs"], session_ids):
+                entry["session_id"] = session_id
+        logger.info(f"Signed batch of {batch['count']} items under root {batch['root']}")
+        
+        return {
+            "status": "success",
+            **batch
+        }
+    
     def handle_request(self, request_data):
         """
         Handle incoming requests by routing them to appropriate handlers
@@ -421,16 +1305,19 @@ class BaseEnclaveApp:
                 endpoint = request_data.get("endpoint", "")
                 data = request_data.get("data", {})
             
-            # Handle standard endpoints
-            # Handle settlement too for now
-            if endpoint == "/status" or endpoint == "/settlement":
-                return self.handle_status_request(data)
-            elif endpoint == "/attest":
-                return self.handle_attestation_request(data)
-            elif endpoint == "/formatted-attest":
-                return self.handle_formatted_attestation_request(data)
-            elif endpoint == "/initialize":
-                return self.handle_initialize_request(data)
+            # Dispatch to the registered route, if any
+            matched, response = self.router.dispatch(endpoint, data)
+            if matched:
+                return response
+            
+            # Fall back to the custom handler hook
+            handler = self.get_custom_handler(request_data)
+            if handler:
+                return handler(data)
+            
+            # Malformed paths under a registered route (e.g. "/fibonacci/") are not found
+            if self.router.matches_prefix(endpoint):
+                return {"error": f"No route matches {endpoint}"}, 404
             
             # For any other endpoint, return a simple response
             response = {
@@ -445,6 +1332,73 @@ class BaseEnclaveApp:
             logger.error(traceback.format_exc())
             return {"error": str(e)}, 500
 
+    def submit_job(self, fn, *args, on_done=None, format_result=None):
+        """
+        Run a long computation on the job process pool instead of the connector thread
+        
+        Args:
+            fn (callable): Module-level (picklable) function to run
+            *args: Picklable arguments for fn
+            on_done (callable, optional): Called with the result once the job completes,
+                in the submitting session. Skipped if that session's result changed
+                after submission (a newer result must not be overwritten) or the
+                session was evicted.
+            format_result (callable, optional): Renders the result for /jobs/<id>
+                responses, e.g. to keep large values JSON-friendly
+            
+        Returns:
+            str: The job id, to be polled through /jobs/<id>
+            
+        Raises:
+            JobQueueFullError: If JOB_MAX_PENDING jobs are already queued or running
+        """
+        if on_done is None:
+            return self.jobs.submit(fn, *args, format_result=format_result)
+        
+        # Completion runs on a pool thread; apply the result to the submitting session
+        # unless it has moved on since
+        session = self.current_session
+        version = session.result_version
+        def _on_done(result):
+            with session.lock:
+                if session.result_version != version or self.sessions.find(session.session_id) is not session:
+                    logger.info(f"Dropped stale job result for session {session.session_id}")
+                    return
+                with self.session_context(session):
+                    on_done(result)
+        
+        return self.jobs.submit(fn, *args, on_done=_on_done, format_result=format_result)
+    
+    def handle_job_request(self, data, job_id=None):
+        """
+        Handle a request for job state: /jobs lists all retained jobs,
+        /jobs/<id> reports the state and result of a single job
+        
+        Args:
+            data (dict): Request data (unused)
+            job_id (str, optional): The job id from the path
+            
+        Returns:
+            dict: Response containing the job state(s)
+        """
+        if not job_id:
+            return {
+                "status": "success",
+                "jobs": self.jobs.list()
+            }
+        
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {
+                "status": "error",
+                "message": f"Unknown job {job_id}"
+            }, 404
+        
+        return {
+            "status": "success",
+            "job": job
+        }
+    
     def handle_initialize_request(self, data):
         """
         Handle an initialization request with raw bytes data
@@ -491,6 +1445,165 @@ class BaseEnclaveApp:
                 "message": str(e)
             }, 500
     
+    def handle_init_stream_open_request(self, data):
+        """
+        Open a chunked, encrypted initialization upload
+        
+        The sender picks a fresh 32-byte AES-256-GCM key, ECIES-encrypts it to the
+        enclave public key (the attestation's public_key) and sends it as "key".
+        Chunks are then sent to /initialize/stream/<upload_id>/chunks/<index>, sealed
+        as described in init_stream.py.
+        
+        Args:
+            data (dict): Request data with "key" (base64 ECIES ciphertext) and
+                optionally "size" (bytes) and "sha256" (hex) of the plaintext
+                
+        Returns:
+            dict: Response containing the upload id and resume point
+        """
+        if not isinstance(data, dict) or not data.get("key"):
+            return {
+                "status": "error",
+                "message": "Request must include 'key' field with the base64-encoded encrypted upload key"
+            }, 400
+        if not self.kms_service:
+            return {
+                "status": "error",
+                "message": "KMS service not available"
+            }, 500
+        
+        size = data.get("size")
+        if size is not None and (not isinstance(size, int) or size < 0):
+            return {
+                "status": "error",
+                "message": "'size' must be a non-negative integer"
+            }, 400
+        
+        try:
+            key = self.kms_service.decrypt_data(base64.b64decode(data["key"], validate=True))
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Failed to decrypt upload key: {e}"
+            }, 400
+        if len(key) != 32:
+            return {
+                "status": "error",
+                "message": "Upload key must be 32 bytes"
+            }, 400
+        
+        try:
+            upload = self.init_streams.open(key, size, data.get("sha256"), self.current_session.session_id)
+        except InitStreamError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }, e.code
+        return {
+            "status": "success",
+            "upload": upload.status()
+        }
+    
+    def handle_init_stream_status_request(self, data, upload_id):
+        """
+        Handle a request for the resume point of an initialization upload
+        
+        Args:
+            data (dict): Request data (unused)
+            upload_id (str): The upload id
+            
+        Returns:
+            dict: Response containing the next chunk index and bytes received
+        """
+        upload = self.init_streams.get(upload_id)
+        if upload is None:
+            return {
+                "status": "error",
+                "message": f"Unknown upload {upload_id}"
+            }, 404
+        with upload.lock:
+            return {
+                "status": "success",
+                "upload": upload.status()
+            }
+    
+    def handle_init_stream_chunk_request(self, data, upload_id, index):
+        """
+        Handle one chunk of an initialization upload
+        
+        Chunks are applied in order; a chunk that was already received is
+        acknowledged without being applied again. The chunk with "final": true
+        completes the upload: the data is checked against the declared size and
+        digest and handed to initialize_stream() in the upload's session.
+        
+        Args:
+            data (dict): Request data with "data" (base64 sealed chunk) and "final" (bool)
+            upload_id (str): The upload id
+            index (int): The chunk index
+            
+        Returns:
+            dict: Response containing the upload's resume point
+        """
+        upload = self.init_streams.get(upload_id)
+        if upload is None:
+            return {
+                "status": "error",
+                "message": f"Unknown upload {upload_id}"
+            }, 404
+        if not isinstance(data, dict) or "data" not in data:
+            return {
+                "status": "error",
+                "message": "Request must include 'data' field with the base64-encoded chunk"
+            }, 400
+        
+        try:
+            ciphertext = base64.b64decode(data["data"], validate=True)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Failed to decode base64 data: {str(e)}"
+            }, 400
+        
+        with upload.lock:
+            try:
+                applied = upload.write(index, ciphertext, bool(data.get("final")))
+                response = {
+                    "status": "success",
+                    "upload": upload.status()
+                }
+                if not (applied and upload.complete):
+                    return response
+                
+                stream = upload.commit()
+            except InitStreamError as e:
+                if upload.complete:
+                    # A completed upload that does not match cannot be resumed
+                    self.init_streams.discard(upload_id)
+                return {
+                    "status": "error",
+                    "message": str(e),
+                    "upload": upload.status()
+                }, e.code
+            
+            try:
+                with self.session_context(self.sessions.get(upload.session_id)):
+                    initialized = self.initialize_stream(stream, upload.received_bytes, upload.digest)
+            except Exception as e:
+                logger.error(f"Error initializing from upload {upload_id}: {e}")
+                logger.error(traceback.format_exc())
+                initialized = False
+            finally:
+                upload.close()
+        
+        if not initialized:
+            self.init_streams.discard(upload_id)
+            return {
+                "status": "error",
+                "message": "Failed to initialize with provided data"
+            }, 500
+        logger.info(f"Completed initialization upload {upload_id}: {upload.received_bytes} bytes")
+        return response
+    
     def get_custom_handler(self, request_data):
         """
         Get a custom handler for the given endpoint
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('eth-signer')
+
+# Preferred first; SECP256K1_BACKEND forces one
+BACKENDS = ("coincurve", "eth_keys")
+
+def available_backends(first_only=False):
+    """Return the secp256k1 backends that can be imported here, in preference order"""
+    available = []
+    for backend in BACKENDS:
+        try:
+            __import__(backend)
+        except ImportError:
+            continue
+        available.append(backend)
+        if first_only:
+            break
+    return available
+
+class EthSigner:
+    """
+    secp256k1 signer producing Ethereum signatures over keccak256(data).
+
+    Built once per key: the key object of the chosen backend is kept, so
+    signing is a keccak hash plus a single native (coincurve/libsecp256k1)
+    or pure-Python (eth_keys) signing call. Signatures are 65 bytes,
+    r || s || v with v in {27, 28}, and are accepted by ecrecover.
+    """
+
+    def __init__(self, private_key_bytes, backend=None):
+        """
+        Initialize the signer
+
+        Args:
+            private_key_bytes (bytes): 32-byte secp256k1 private scalar
+            backend (str, optional): "coincurve" or "eth_keys". Defaults to
+                SECP256K1_BACKEND or the first available backend.
+        """
+        from eth_utils import keccak
+        self._keccak = keccak
+
+        backend = backend or os.environ.get('SECP256K1_BACKEND')
+        if not backend:
+            available = available_backends(first_only=True)
+            if not available:
+                raise RuntimeError("No secp256k1 backend available; install coincurve or eth_keys")
+            backend = available[0]
+        self.backend = backend
+
+        if backend == "coincurve":
+            import coincurve
+            self._key = coincurve.PrivateKey(private_key_bytes)
+            self.sign_hash = self._sign_hash_coincurve
+        elif backend == "eth_keys":
+            from eth_keys import keys
+            self._key = keys.PrivateKey(private_key_bytes)
+            self.sign_hash = self._sign_hash_eth_keys
+        else:
+            raise ValueError(f"Unknown secp256k1 backend '{backend}'")
+        logger.info(f"Initialized secp256k1 signer with {backend} backend")
+
+    @classmethod
+    def from_private_key(cls, private_key, backend=None):
+        """Build a signer from a `cryptography` EC private key"""
+        return cls(private_key.private_numbers().private_value.to_bytes(32, byteorder='big'), backend)
+
+    def _sign_hash_coincurve(self, message_hash):
+        # r || s || recovery id, low-s normalized by libsecp256k1
+        signature = self._key.sign_recoverable(message_hash, hasher=None)
+        return signature[:64] + bytes([signature[64] + 27])
+
+    def _sign_hash_eth_keys(self, message_hash):
+        signature = self._key.sign_msg_hash(message_hash)
+        return signature.to_bytes()[:64] + bytes([signature.v + 27])
+
+    def sign(self, data):
+        """
+        Sign keccak256(data)
+
+        Args:
+            data (bytes): Data to sign
+
+        Returns:
+            bytes: 65-byte Ethereum signature (r, s, v)
+        """
+        return self.sign_hash(self._keccak(data))
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-init-stream')
+
+# Chunk i is sealed with AES-256-GCM under the upload key, nonce = 4 zero bytes || i
+# (64-bit big endian) and associated data = "init-chunk" || i || final flag, so
+# chunks cannot be reordered, replayed into another position or truncated
+CHUNK_AAD_PREFIX = b"init-chunk"
+
+def chunk_nonce(index):
+    """The AES-GCM nonce of chunk `index`; unique per chunk since every upload has a fresh key"""
+    return b"\x00" * 4 + struct.pack("!Q", index)
+
+def chunk_aad(index, final):
+    """The associated data authenticated with chunk `index`"""
+    return CHUNK_AAD_PREFIX + struct.pack("!Q?", index, bool(final))
+
+class InitStreamError(Exception):
+    """A chunk was rejected; `code` is the HTTP-style status to answer with"""
+
+    def __init__(self, message, code=400):
+        super().__init__(message)
+        self.code = code
+
+class InitStream:
+    """
+    One chunked, resumable initialization upload.
+
+    Chunks must arrive in order. Each one is authenticated and decrypted, fed
+    into a running SHA-256 and appended to a spool that stays in memory up to
+    INIT_SPOOL_MAX_MEMORY bytes and then spills to a temporary file
+    (INIT_SPOOL_DIR). A chunk that was already received is acknowledged again
+    without being applied twice, so the sender can retry a chunk whose response
+    was lost and resume from `received_bytes` after a failure.
+    """
+
+    def __init__(self, upload_id, key, size=None, sha256=None, session_id=None):
+        """
+        Initialize the upload
+
+        Args:
+            upload_id (str): The upload id
+            key (bytes): 32-byte AES-256-GCM key the chunks are sealed with
+            size (int, optional): Expected plaintext size, checked on commit
+            sha256 (str, optional): Expected plaintext SHA-256 (hex), checked on commit
+            session_id (str, optional): The session the upload initializes
+        """
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self.upload_id = upload_id
+        self.session_id = session_id
+        self._aead = AESGCM(key)
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+        self.next_index = 0
+        self.received_bytes = 0
+        self.complete = False
+        self._digest = hashlib.sha256()
+        self._spool = tempfile.SpooledTemporaryFile(
+            max_size=int(os.environ.get('INIT_SPOOL_MAX_MEMORY', 64 * 1024 * 1024)),
+            dir=os.environ.get('INIT_SPOOL_DIR') or None
+        )
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = threading.Lock()
+
+    def write(self, index, ciphertext, final=False):
+        """
+        Authenticate, hash and spool chunk `index`. Caller holds `lock`.
+
+        Args:
+            index (int): The chunk index
+            ciphertext (bytes): The sealed chunk (ciphertext || 16-byte tag)
+            final (bool): Whether this is the last chunk
+
+        Returns:
+            bool: False if the chunk had already been received, True otherwise
+
+        Raises:
+            InitStreamError: If the chunk is out of order, fails authentication,
+                or exceeds the declared size
+        """
+        from cryptography.exceptions import InvalidTag
+
+        self.last_used = time.time()
+        if index < self.next_index:
+            return False
+        if self.complete:
+            raise InitStreamError(f"Upload {self.upload_id} is already complete", 409)
+        if index > self.next_index:
+            raise InitStreamError(f"Expected chunk {self.next_index}, got {index}", 409)
+
+        try:
+            chunk = self._aead.decrypt(chunk_nonce(index), ciphertext, chunk_aad(index, final))
+        except InvalidTag:
+            raise InitStreamError(f"Chunk {index} failed authentication")
+        if self.size is not None and self.received_bytes + len(chunk) > self.size:
+            raise InitStreamError(f"Chunk {index} exceeds the declared size of {self.size} bytes")
+
+        self._digest.update(chunk)
+        self._spool.write(chunk)
+        self.received_bytes += len(chunk)
+        self.next_index += 1
+        self.complete = bool(final)
+        return True
+
+    def commit(self):
+        """
+        Check the completed upload against its declared size and digest
+
+        Returns:
+            file: The plaintext, rewound to the start. The caller owns it and closes it.
+
+        Raises:
+            InitStreamError: If the upload is incomplete or does not match
+        """
+        if not self.complete:
+            raise InitStreamError(f"Upload {self.upload_id} is not complete", 409)
+        if self.size is not None and self.received_bytes != self.size:
+            raise InitStreamError(f"Received {self.received_bytes} bytes, expected {self.size}")
+        if self.sha256 is not None and self.digest != self.sha256:
+            raise InitStreamError("Digest mismatch for the uploaded data")
+        self._spool.seek(0)
+        return self._spool
+
+    @property
+    def digest(self):
+        """SHA-256 (hex) of the plaintext received so far"""
+        return self._digest.hexdigest()
+
+    def status(self):
+        """The resume point and progress of the upload"""
+        return {
+            "upload_id": self.upload_id,
+            "next_index": self.next_index,
+            "received_bytes": self.received_bytes,
+            "size": self.size,
+            "complete": self.complete,
+            "sha256": self.digest if self.complete else None
+        }
+
+    def close(self):
+        """Discard the spooled data"""
+        self._spool.close()
+
+class InitStreamStore:
+    """
+    Open uploads keyed by upload id.
+
+    At most `max_uploads` uploads are in progress at once. Completed uploads are
+    kept (without their data) so a retried final chunk is still acknowledged.
+    Uploads idle for longer than `idle_ttl` seconds are discarded when a new
+    one is opened.
+    """
+
+    def __init__(self, idle_ttl=None, max_uploads=None):
+        """
+        Initialize the store
+
+        Args:
+            idle_ttl (int, optional): Idle seconds before an upload is discarded.
+                Defaults to INIT_STREAM_IDLE_TTL or 3600.
+            max_uploads (int, optional): Maximum number of open uploads.
+                Defaults to INIT_STREAM_MAX or 4.
+        """
+        self.idle_ttl = idle_ttl or int(os.environ.get('INIT_STREAM_IDLE_TTL', 3600))
+        self.max_uploads = max_uploads or int(os.environ.get('INIT_STREAM_MAX', 4))
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def open(self, key, size=None, sha256=None, session_id=None):
+        """
+        Open a new upload
+
+        Args:
+            key (bytes): 32-byte key the chunks are sealed with
+            size (int, optional): Expected plaintext size
+            sha256 (str, optional): Expected plaintext SHA-256 (hex)
+            session_id (str, optional): The session the upload initializes
+
+        Returns:
+            InitStream: The upload
+
+        Raises:
+            InitStreamError: If too many uploads are open
+        """
+        with self.lock:
+            self._expire()
+            if sum(1 for upload in self.uploads.values() if not upload.complete) >= self.max_uploads:
+                raise InitStreamError(f"Too many open uploads (max {self.max_uploads})", 429)
+            upload = InitStream(os.urandom(16).hex(), key, size, sha256, session_id)
+            self.uploads[upload.upload_id] = upload
+        logger.info(f"Opened initialization upload {upload.upload_id}")
+        return upload
+
+    def get(self, upload_id):
+        """Return the upload for `upload_id`, or None"""
+        with self.lock:
+            return self.uploads.get(upload_id)
+
+    def discard(self, upload_id):
+        """Forget an upload and drop its spooled data"""
+        with self.lock:
+            upload = self.uploads.pop(upload_id, None)
+        if upload is not None:
+            upload.close()
+
+    def active(self):
+        """Return the number of uploads in progress"""
+        with self.lock:
+            return sum(1 for upload in self.uploads.values() if not upload.complete)
+
+    def _expire(self):
+        """Discard idle uploads. Caller holds the lock."""
+        cutoff = time.time() - self.idle_ttl
+        for upload_id in [upload_id for upload_id, upload in self.uploads.items() if upload.last_used < cutoff]:
+            self.uploads.pop(upload_id).close()
+            logger.info(f"Discarded idle initialization upload {upload_id}")
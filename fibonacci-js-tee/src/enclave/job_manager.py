@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import uuid
+import logging
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-jobs')
+
+class JobQueueFullError(RuntimeError):
+    """Too many jobs are pending to accept another one"""
+
+class Job:
+    """Bookkeeping for a single submitted job"""
+
+    def __init__(self, job_id, name, format_result=None):
+        self.job_id = job_id
+        self.name = name
+        self.format_result = format_result
+        self.status = "pending"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        """Return a JSON-serializable view of the job"""
+        status = self.status
+        # Queued jobs only start once a pool worker frees up
+        if status == "pending" and self.future is not None and self.future.running():
+            status = "running"
+        end = self.finished_at or time.time()
+        result = self.result
+        if result is not None and self.format_result is not None:
+            result = self.format_result(result)
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "status": status,
+            "submitted_at": int(self.submitted_at),
+            "elapsed_seconds": round(end - self.submitted_at, 3),
+            "result": result,
+            "error": self.error
+        }
+
+class JobManager:
+    """
+    Runs long computations on a bounded process pool so they neither block
+    the connector thread nor contend for the GIL.
+
+    Jobs move through pending -> running -> completed/failed. At most
+    `max_pending` jobs may be queued or running at once. Finished jobs are
+    kept for `retention_seconds` so clients can poll `/jobs/<id>`, then
+    evicted.
+    """
+
+    def __init__(self, max_workers=None, retention_seconds=None, max_pending=None):
+        """
+        Initialize the job manager
+
+        Args:
+            max_workers (int, optional): Size of the process pool. Defaults to
+                JOB_WORKERS or the number of available vCPUs.
+            retention_seconds (int, optional): How long finished jobs are kept.
+                Defaults to JOB_RETENTION_SECONDS or 600.
+            max_pending (int, optional): Jobs that may be queued or running at once.
+                Defaults to JOB_MAX_PENDING or 64.
+        """
+        self.max_workers = max_workers or int(os.environ.get('JOB_WORKERS', os.cpu_count() or 1))
+        self.retention_seconds = retention_seconds or int(os.environ.get('JOB_RETENTION_SECONDS', 600))
+        self.max_pending = max_pending or int(os.environ.get('JOB_MAX_PENDING', 64))
+        self.jobs = {}
+        self.lock = threading.Lock()
+        # The pool is created on first use so apps that never submit jobs pay nothing
+        self._executor = None
+        logger.info(f"Initialized JobManager with {self.max_workers} workers, "
+                    f"{self.retention_seconds}s retention")
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawn rather than fork: the connector threads are not fork-safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, fn, *args, on_done=None, format_result=None):
+        """
+        Submit a job to the process pool
+
+        Args:
+            fn (callable): Module-level (picklable) function to run
+            *args: Picklable arguments for fn
+            on_done (callable, optional): Called in this process with the
+                result when the job completes successfully
+            format_result (callable, optional): Turns the result into a
+                JSON-serializable value when the job is reported; by default
+                the result is reported as-is
+
+        Returns:
+            str: The job id
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already queued or running
+        """
+        job = Job(str(uuid.uuid4()), getattr(fn, '__name__', 'job'), format_result)
+        with self.lock:
+            self._evict_expired()
+            pending = sum(1 for queued in self.jobs.values() if queued.status == "pending")
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"Too many pending jobs (max {self.max_pending})")
+            self.jobs[job.job_id] = job
+            future = self._get_executor().submit(fn, *args)
+            job.future = future
+
+        def _finish(fut):
+            try:
+                result = fut.result()
+                if on_done:
+                    on_done(result)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} ({job.name}) failed: {e}")
+                logger.error(traceback.format_exc())
+                with self.lock:
+                    job.status = "failed"
+                    job.error = str(e)
+                    job.finished_at = time.time()
+                return
+
+            with self.lock:
+                job.status = "completed"
+                job.result = result
+                job.finished_at = time.time()
+            logger.info(f"Job {job.job_id} ({job.name}) completed")
+
+        future.add_done_callback(_finish)
+        logger.info(f"Submitted job {job.job_id} ({job.name})")
+        return job.job_id
+
+    def get(self, job_id):
+        """
+        Get the state of a job
+
+        Args:
+            job_id (str): The job id returned by submit
+
+        Returns:
+            dict: The job state, or None if the job is unknown or was evicted
+        """
+        with self.lock:
+            self._evict_expired()
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        """Return the state of all retained jobs"""
+        with self.lock:
+            self._evict_expired()
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def _evict_expired(self):
+        """Drop finished jobs older than the retention window. Caller holds the lock."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            logger.info(f"Evicted {len(expired)} finished jobs")
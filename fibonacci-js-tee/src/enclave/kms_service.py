@@ -1,36 +1,21 @@
 #!/usr/bin/env python3
 
 import os
-import json
 import time
-import tempfile
 import base64
 import logging
 import traceback
-import subprocess
-import uuid
-import random
-import string
-import re
-import abc
-from datetime import datetime, timedelta
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
-import cbor2
-from cose.messages import Sign1Message
-from cose.keys import EC2Key
-from cryptography import x509
-from cryptography.x509.oid import NameOID
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import ec
 from typing import Dict, Any, Optional, Tuple, List, Union
 import hashlib
-from Crypto.Signature import PKCS1_PSS
-from Crypto.Hash import SHA384
-from eth_utils import keccak
-from eth_keys import keys
+
+from startup_profile import profile
+
+# Crypto dependencies are imported by the backend that uses them (cryptography,
+# cose, cbor2 and eth_keys for MockKmsService; nsm_wrapper for RealKmsService),
+# so importing this module stays cheap and each backend loads only what it needs.
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -43,6 +28,9 @@ class KmsService(ABC):
         self.private_key = None
         self.public_key = None
         self.nsm_util = None
+        self._signer = None
+        self._decrypt_pool = None
+        self._decrypt_pool_lock = threading.Lock()
         self._init_crypto()
     
     @abstractmethod
@@ -55,6 +43,39 @@ class KmsService(ABC):
         """Decrypt data using the private key."""
         pass
     
+    def decrypt_many(self, ciphertexts: List[bytes]) -> List[Dict[str, Any]]:
+        """Decrypt a batch of ciphertexts on a thread pool.
+        
+        Each item goes through decrypt_data, which uses key material prepared
+        once at init. A failing item does not fail the batch.
+        
+        Args:
+            ciphertexts: The ciphertexts to decrypt.
+            
+        Returns:
+            list: One entry per ciphertext, in order: {"plaintext": bytes} on
+                success or {"error": str} on failure
+        """
+        def decrypt_one(ciphertext):
+            try:
+                return {"plaintext": self.decrypt_data(ciphertext)}
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}"}
+        
+        if len(ciphertexts) < 2:
+            return [decrypt_one(ciphertext) for ciphertext in ciphertexts]
+        
+        with self._decrypt_pool_lock:
+            if self._decrypt_pool is None:
+                workers = int(os.environ.get('DECRYPT_WORKERS', min(8, os.cpu_count() or 1)))
+                self._decrypt_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decrypt")
+        results = list(self._decrypt_pool.map(decrypt_one, ciphertexts))
+        
+        failed = sum(1 for result in results if "error" in result)
+        if failed:
+            logger.warning(f"Failed to decrypt {failed} of {len(results)} ciphertexts")
+        return results
+    
     @abstractmethod
     def generate_key(self) -> Tuple[bytes, bytes]:
         """Generate a new key pair."""
@@ -66,16 +87,40 @@ class KmsService(ABC):
         pass
     
     @abstractmethod
-    def generate_attestation(self, nonce: Optional[bytes] = None) -> bytes:
+    def generate_attestation(self, nonce: Optional[bytes] = None, user_data: Optional[bytes] = None) -> bytes:
         """Generate an attestation document.
         
         Args:
             nonce: Optional nonce to include in the attestation document.
+            user_data: Optional user data to include in the attestation document.
             
         Returns:
             bytes: The attestation document
         """
         pass
+    
+    def generate_sealing_key(self, credentials: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str]:
+        """Create a key for sealing enclave state snapshots.
+        
+        Args:
+            credentials: AWS credentials and KMS key id, for backends that call AWS KMS.
+            
+        Returns:
+            tuple: (32-byte key, opaque key blob stored with the sealed snapshot)
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support state sealing")
+    
+    def unseal_key(self, key_blob: str, credentials: Optional[Dict[str, Any]] = None) -> bytes:
+        """Recover a sealing key from the key blob returned by generate_sealing_key.
+        
+        Args:
+            key_blob: The key blob stored with the sealed snapshot.
+            credentials: AWS credentials, for backends that call AWS KMS.
+            
+        Returns:
+            bytes: The 32-byte sealing key
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support state sealing")
 
 class RealKmsService(KmsService):
     """Real KMS service implementation using AWS KMS."""
@@ -83,8 +128,10 @@ class RealKmsService(KmsService):
     def _init_crypto(self):
         """Initialize cryptographic components."""
         try:
-            from nsm_wrapper.nsm_util import NSMUtil
-            self.nsm_util = NSMUtil()
+            with profile.phase("import:nsm_wrapper"):
+                from nsm_wrapper.nsm_util import NSMUtil
+            with profile.phase("init:nsm"):
+                self.nsm_util = NSMUtil()
             logger.info("Successfully initialized NSMUtil")
         except Exception as e:
             logger.error(f"Failed to initialize NSMUtil: {e}")
@@ -102,18 +149,70 @@ class RealKmsService(KmsService):
         """Sign data using AWS KMS."""
         return self.nsm_util.sign_data(data)
     
-    def generate_attestation(self, nonce: Optional[bytes] = None) -> bytes:
-        """Generate an attestation document using the NSM."""
-        attestation_doc = self.nsm_util.get_attestation_doc()
+    def generate_attestation(self, nonce: Optional[bytes] = None, user_data: Optional[bytes] = None) -> bytes:
+        """Generate an attestation document using the NSM, bound to the nonce and user data if given."""
+        if isinstance(nonce, str):
+            nonce = nonce.encode('utf-8')
+        attestation_doc = self.nsm_util.get_attestation_doc(nonce=nonce, user_data=user_data)
         if not attestation_doc:
             raise RuntimeError("Failed to get attestation document from NSM")
         return attestation_doc
+    
+    def _kmstool(self, command: str, credentials: Dict[str, Any], *args: str) -> Dict[str, str]:
+        """Run kmstool_enclave_cli and parse its "NAME: value" output lines."""
+        import subprocess
+        
+        cmd = [
+            "kmstool_enclave_cli", command,
+            "--region", credentials.get("region") or "us-east-1",
+            "--proxy-port", os.environ.get('KMS_PROXY_PORT', '8000'),
+            "--aws-access-key-id", credentials.get("aws_access_key_id", ""),
+            "--aws-secret-access-key", credentials.get("aws_secret_access_key", "")
+        ]
+        if credentials.get("aws_session_token"):
+            cmd += ["--aws-session-token", credentials["aws_session_token"]]
+        cmd += list(args)
+        
+        completed = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if completed.returncode != 0:
+            raise RuntimeError(f"kmstool_enclave_cli {command} failed: {completed.stderr.strip()}")
+        
+        fields = {}
+        for line in completed.stdout.splitlines():
+            name, sep, value = line.partition(":")
+            if sep:
+                fields[name.strip()] = value.strip()
+        return fields
+    
+    def generate_sealing_key(self, credentials: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str]:
+        """Generate an AES-256 data key with AWS KMS.
+        
+        The plaintext key is only returned to an enclave whose attestation
+        satisfies the KMS key policy, so bind the policy to the enclave's PCRs
+        to let only enclaves with the same measurements unseal snapshots.
+        """
+        credentials = credentials or {}
+        key_id = credentials.get("kms_key_id") or os.environ.get('SEAL_KMS_KEY_ID')
+        if not key_id:
+            raise RuntimeError("No KMS key id for state sealing; set SEAL_KMS_KEY_ID")
+        fields = self._kmstool("genkey", credentials, "--key-id", key_id, "--key-spec", "AES-256")
+        return base64.b64decode(fields["PLAINTEXT"]), fields["CIPHERTEXT"]
+    
+    def unseal_key(self, key_blob: str, credentials: Optional[Dict[str, Any]] = None) -> bytes:
+        """Decrypt a KMS data key; KMS checks the enclave attestation against the key policy."""
+        fields = self._kmstool("decrypt", credentials or {}, "--ciphertext", key_blob)
+        return base64.b64decode(fields["PLAINTEXT"])
 
 class MockKmsService(KmsService):
     """Mock KMS service implementation for testing."""
     
     def _init_crypto(self):
         """Initialize mock cryptographic components using deterministic keys."""
+        with profile.phase("import:cryptography"):
+            from cryptography import x509
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric import rsa
+        
         # In the container, keys are at /app/keys/
         keys_dir = '/app/keys'
         key_info_path = os.path.join(keys_dir, 'key_info.json')
@@ -141,6 +240,10 @@ class MockKmsService(KmsService):
                 )
             self.app_public_key = self.app_private_key.public_key()
             
+            # ECIES key: the secp256k1 app key, whose public key is the attestation's
+            # public_key; prepared once as the raw scalar instead of per decryption
+            self._decryption_key = self.app_private_key.private_numbers().private_value.to_bytes(32, byteorder='big')
+            
             # Verify the key is an RSA key
             if not isinstance(self.private_key, rsa.RSAPrivateKey):
                 logger.warning("Loaded key is not an RSA key. NSM uses RSA keys for signing.")
@@ -156,20 +259,19 @@ class MockKmsService(KmsService):
                 self.enclave_cert = x509.load_pem_x509_certificate(f.read())
                 
             logger.info("Successfully loaded mock keys and certificates")
+            
+            self._build_attestation_template()
         except Exception as e:
             logger.error(f"Failed to load mock keys: {e}")
             raise
     
     def decrypt_data(self, ciphertext: bytes) -> bytes:
         """Decrypt data using ECIES with SECP256K1."""
+        import ecies
+        
         try:
-            # Extract the raw private key bytes in the format expected by eciespy
-            private_key_hex = hex(self.private_key.private_numbers().private_value)[2:]
-            if len(private_key_hex) < 64:  # Ensure proper padding
-                private_key_hex = '0' * (64 - len(private_key_hex)) + private_key_hex
-                
             # Decrypt using ECIES
-            plaintext = eciespy.decrypt(private_key_hex, ciphertext)
+            plaintext = ecies.decrypt(self._decryption_key, ciphertext)
             return plaintext
         except Exception as e:
             logger.error(f"Error in ECIES decryption: {e}")
@@ -178,6 +280,10 @@ class MockKmsService(KmsService):
     
     def generate_key(self) -> Tuple[bytes, bytes]:
         """Generate a deterministic SECP256K1 key pair for Ethereum compatibility."""
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        
         # Use deterministic seed for testing predictability
         seed = f"session-{int(time.time())}"
         
@@ -201,116 +307,114 @@ class MockKmsService(KmsService):
         
         return private_bytes, public_bytes
     
+    @property
+    def signer(self):
+        """The app key's secp256k1 signer, built on first use and reused for every signature."""
+        if self._signer is None:
+            from eth_signer import EthSigner
+            self._signer = EthSigner.from_private_key(self.app_private_key)
+        return self._signer
+    
     def sign_data(self, data: bytes) -> bytes:
         """Sign data using ECDSA with secp256k1 (Ethereum compatible)."""
         try:
-            # Extract raw private key bytes for eth_keys compatibility
-            private_bytes = self.app_private_key.private_numbers().private_value.to_bytes(32, byteorder='big')
-            eth_private_key = keys.PrivateKey(private_bytes)
-            
-            # Generate hash using keccak256 directly on the raw bytes
-            message_hash = keccak(data)
-            
-            # Sign the message hash using eth_keys
-            signature = eth_private_key.sign_msg_hash(message_hash)
-            sig_bytes = signature.to_bytes()
-            
-            # Extract components
-            r = sig_bytes[:32]
-            s = sig_bytes[32:64]
-            v = sig_bytes[64:]
-            v_int = int.from_bytes(v, byteorder='big')
-            
-            # For Ethereum compatibility, make sure v is 27/28 instead of 0/1
-            if v_int < 27 and v_int <= 1:
-                v_adjusted = bytes([v_int + 27])
-                ethereum_sig = r + s + v_adjusted
-            else:
-                ethereum_sig = sig_bytes
-            
-            # Return the complete signature
-            return ethereum_sig
-            
+            return self.signer.sign(data)
         except Exception as e:
             logger.error(f"Error in secp256k1 signing: {e}")
             logger.error(traceback.format_exc())
             raise
     
-    def generate_attestation(self, nonce: Optional[bytes] = None) -> bytes:
-        """Generate a deterministic mock attestation document that matches NSM format."""
-        # Create deterministic PCRs
-        pcrs = {}
-        for i in range(16):
-            pcr_data = f"deterministic-pcr-{i}".encode('utf-8')
-            pcr_hash = hashlib.sha384(pcr_data).digest()
-            pcrs[i] = pcr_hash
+    def _build_attestation_template(self):
+        """Precompute the static parts of the mock attestation document.
         
-        # Create module_id as hex string
-        module_id = hashlib.sha256(b"mock-module-id").hexdigest()
+        The payload is a CBOR map whose fields are all fixed except timestamp,
+        user_data and nonce, so it is pre-encoded as the bytes before the
+        timestamp value, between timestamp and user_data values, and between
+        user_data and nonce values.
+        """
+        import cbor2
+        from cryptography.hazmat.primitives import serialization
         
-        # Create attestation document payload
-        current_time = int(time.time() * 1000)  # Convert to milliseconds
-        payload = {
-            "module_id": module_id,  # Now a hex string instead of bytes
-            "digest": "SHA384",
-            "timestamp": current_time,
-            "pcrs": pcrs,
-            "certificate": self.enclave_cert.public_bytes(serialization.Encoding.DER),
-            "cabundle": [
+        # Create deterministic PCRs
+        pcrs = {i: hashlib.sha384(f"deterministic-pcr-{i}".encode('utf-8')).digest() for i in range(16)}
+        
+        # Fields in NSM order; timestamp, user_data and nonce are patched per call
+        fields_before = [
+            ("module_id", hashlib.sha256(b"mock-module-id").hexdigest()),
+            ("digest", "SHA384")
+        ]
+        fields_between = [
+            ("pcrs", pcrs),
+            ("certificate", self.enclave_cert.public_bytes(serialization.Encoding.DER)),
+            ("cabundle", [
                 self.root_cert.public_bytes(serialization.Encoding.DER),
                 self.int1_cert.public_bytes(serialization.Encoding.DER),
                 self.int2_cert.public_bytes(serialization.Encoding.DER)
-            ],
-            "public_key": self.app_public_key.public_bytes(
+            ]),
+            ("public_key", self.app_public_key.public_bytes(
                 encoding=serialization.Encoding.DER,
                 format=serialization.PublicFormat.SubjectPublicKeyInfo
-            ),
-            "user_data": None,
-            "nonce": None
-        }
-        
-        # Convert payload to CBOR
-        cbor_payload = cbor2.dumps(payload)
-        
-        # Create COSE Sign1 message with deterministic kid
-        protected_header = {
-            1: -35  # alg: ES384
-        }
-        
-        # Get the raw private key value
-        private_key_value = self.private_key.private_numbers().private_value.to_bytes(48, 'big')
-        
-        # Create a COSE key from the raw bytes
-        cose_key = EC2Key(
-            crv=2,  # P-384
-            d=private_key_value,
-            x=self.public_key.public_numbers().x.to_bytes(48, 'big'),
-            y=self.public_key.public_numbers().y.to_bytes(48, 'big')
-        )
+            ))
+        ]
         
-        # Create and sign the COSE_Sign1 message
-        msg = Sign1Message(
-            phdr=protected_header,
-            payload=cbor_payload
-        )
-        msg.key = cose_key
+        def encode_fields(fields):
+            return b"".join(cbor2.dumps(key) + cbor2.dumps(value) for key, value in fields)
+        
+        # Map header for 9 entries (0xa0 | 9)
+        self._attestation_payload_head = bytes([0xa0 | 9]) + encode_fields(fields_before) + cbor2.dumps("timestamp")
+        self._attestation_payload_middle = encode_fields(fields_between) + cbor2.dumps("user_data")
+        self._attestation_payload_tail = cbor2.dumps("nonce")
+        
+        # COSE_Sign1 protected header: alg ES384
+        self._attestation_protected = cbor2.dumps({1: -35})
+    
+    def generate_attestation(self, nonce: Optional[bytes] = None, user_data: Optional[bytes] = None) -> bytes:
+        """Generate a deterministic mock attestation document that matches NSM format.
+        
+        The payload is assembled from the precomputed template with the current
+        timestamp, user data and nonce, then COSE_Sign1-signed once with ES384.
+        """
+        import cbor2
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
         
-        # The NSM format expects: [protected headers, unprotected headers, payload, signature]
-        # We need to manually construct this format
-        signed_msg = msg.encode()
+        if isinstance(nonce, str):
+            nonce = nonce.encode('utf-8')
         
-        # Decode the signed message to get its components
-        decoded = cbor2.loads(signed_msg)
+        current_time = int(time.time() * 1000)  # Convert to milliseconds
+        payload = (self._attestation_payload_head + cbor2.dumps(current_time) +
+                   self._attestation_payload_middle + cbor2.dumps(user_data) +
+                   self._attestation_payload_tail + cbor2.dumps(nonce))
+        
+        # Sig_structure for COSE_Sign1 with no external AAD; ES384 signatures are raw r || s
+        sig_structure = cbor2.dumps(["Signature1", self._attestation_protected, b"", payload])
+        r, s = decode_dss_signature(self.private_key.sign(sig_structure, ec.ECDSA(hashes.SHA384())))
+        signature = r.to_bytes(48, 'big') + s.to_bytes(48, 'big')
         
-        # Construct the final NSM format and tag it with 0xD2 (18)
-        final_doc = cbor2.dumps(cbor2.CBORTag(18, [
-            decoded.value[0],  # protected headers
-            decoded.value[1],  # unprotected headers
-            cbor_payload,      # payload
-            decoded.value[3]   # signature
-        ]))
+        # NSM format: tag 18 over [protected headers, unprotected headers, payload, signature]
+        return cbor2.dumps(cbor2.CBORTag(18, [self._attestation_protected, {}, payload, signature]))
+    
+    def _derive_sealing_key(self, salt: bytes) -> bytes:
+        """Derive a sealing key from the mock enclave key, standing in for a measurement-bound KMS key."""
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
         
-        return final_doc
+        key_material = self.private_key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"enclave-state-seal").derive(key_material)
+    
+    def generate_sealing_key(self, credentials: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str]:
+        """Derive a fresh sealing key; the key blob is the random HKDF salt."""
+        salt = os.urandom(16)
+        return self._derive_sealing_key(salt), base64.b64encode(salt).decode('utf-8')
+    
+    def unseal_key(self, key_blob: str, credentials: Optional[Dict[str, Any]] = None) -> bytes:
+        """Re-derive the sealing key from the salt in the key blob."""
+        return self._derive_sealing_key(base64.b64decode(key_blob))
 
 def create_kms_service(env_setup=None):
     """
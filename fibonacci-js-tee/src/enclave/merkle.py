@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Keccak-256 Merkle trees for batch signing.
+
+The layout matches OpenZeppelin's MerkleProof with commutative (sorted-pair)
+hashing, so proofs can be checked on chain with MerkleProof.verify:
+- leaf = keccak256(keccak256(item)), double-hashed so a leaf can never be
+  confused with an internal node
+- node = keccak256(min(a, b) ++ max(a, b))
+- an unpaired node at the end of a level is carried up unchanged
+"""
+
+from eth_utils import keccak
+
+def leaf_hash(item: bytes) -> bytes:
+    """Hash an item into a leaf"""
+    return keccak(keccak(item))
+
+def _hash_pair(a: bytes, b: bytes) -> bytes:
+    return keccak(a + b) if a < b else keccak(b + a)
+
+def build_tree(leaves):
+    """
+    Build a Merkle tree over leaf hashes
+
+    Args:
+        leaves (list): Leaf hashes (bytes), at least one
+
+    Returns:
+        list: The tree levels, from the leaves (levels[0]) up to the root (levels[-1][0])
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def get_proof(levels, index):
+    """
+    Get the inclusion proof for the leaf at `index`
+
+    Args:
+        levels (list): Tree levels returned by build_tree
+        index (int): Leaf index
+
+    Returns:
+        list: Sibling hashes (bytes) from the leaf level upwards
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+def verify_proof(proof, root, leaf):
+    """Check that `leaf` is included under `root`"""
+    node = leaf
+    for sibling in proof:
+        node = _hash_pair(node, sibling)
+    return node == root
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+import functools
+import contextlib
+from bisect import bisect_left
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-metrics')
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond signing up to slow attestations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(labels):
+    """Format a tuple of (name, value) pairs as a Prometheus label set"""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+class Histogram:
+    """Fixed-bucket latency histogram; callers serialize access"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels=()):
+        """Return the Prometheus sample lines for this histogram"""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {self.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format.
+
+    Recording a sample is a lock acquisition plus a few integer updates, cheap
+    enough to leave on for every request. Gauges are read from callbacks at
+    render time, and collectors let other components (such as the router)
+    render metrics they already keep.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # name -> [type, help, {labels: Histogram or number}]
+        self.families = {}
+        self.gauge_functions = {}
+        self.collectors = []
+
+    def describe(self, name, kind, help_text):
+        """
+        Declare a metric family
+
+        Args:
+            name (str): Metric name
+            kind (str): "counter", "gauge" or "histogram"
+            help_text (str): HELP text
+        """
+        with self.lock:
+            self.families.setdefault(name, [kind, help_text, {}])
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            samples = self.families[name][2]
+            samples[key] = samples.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a histogram sample"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            samples = self.families[name][2]
+            histogram = samples.get(key)
+            if histogram is None:
+                histogram = samples[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def time(self, name, **labels):
+        """Record the duration of the block in histogram `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name, help_text, fn):
+        """
+        Register a gauge read at render time
+
+        Args:
+            name (str): Metric name
+            help_text (str): HELP text
+            fn (callable): Returns the current value
+        """
+        self.gauge_functions[name] = (help_text, fn)
+
+    def add_collector(self, fn):
+        """Register a callable returning extra Prometheus text lines at render time"""
+        self.collectors.append(fn)
+
+    def instrument(self, obj, method_name, histogram, errors=None, **labels):
+        """
+        Time every call of obj.method_name, counting exceptions in `errors`
+
+        The wrapper is installed on the instance, so callers that already hold
+        a reference to the original bound method are not affected.
+        """
+        method = getattr(obj, method_name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                if errors:
+                    self.inc(errors, **labels)
+                raise
+            finally:
+                self.observe(histogram, time.perf_counter() - start, **labels)
+
+        setattr(obj, method_name, timed)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, samples) in self.families.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, sample in samples.items():
+                    if isinstance(sample, Histogram):
+                        lines.extend(sample.render(name, labels))
+                    else:
+                        lines.append(f"{name}{format_labels(labels)} {sample}")
+
+        for name, (help_text, fn) in list(self.gauge_functions.items()):
+            try:
+                value = fn()
+            except Exception as e:
+                logger.warning(f"Failed to read gauge {name}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+        return "\n".join(lines) + "\n"
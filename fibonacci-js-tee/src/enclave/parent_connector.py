@@ -9,11 +9,19 @@ import logging
 import traceback
 import abc
 import threading
+import contextlib
+
+from metrics import PROMETHEUS_CONTENT_TYPE
+from startup_profile import profile
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('enclave-connector')
 
+# Largest vsock request accepted by default. The largest regular requests are
+# streamed /initialize chunks: INIT_CHUNK_SIZE (1 MiB) base64-encoded in JSON
+DEFAULT_MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
 class ParentConnector(abc.ABC):
     """
     Abstract base class defining the interface for enclave server connectors.
@@ -24,6 +32,27 @@ class ParentConnector(abc.ABC):
         """Initialize the connector with common attributes"""
         self.running = False
         self.request_handler = None
+        # Optional MetricsRegistry; set by the app alongside request_handler
+        self.metrics = None
+        self.active_connections = 0
+        self._connections_lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def track_connection(self):
+        """Count the connection as active for the duration of the block"""
+        with self._connections_lock:
+            self.active_connections += 1
+        try:
+            yield
+        finally:
+            with self._connections_lock:
+                self.active_connections -= 1
+    
+    def encode_timer(self):
+        """Context manager timing response serialization, if metrics are enabled"""
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.time("enclave_response_encode_seconds", connector=type(self).__name__)
     
     def run(self, **kwargs):
         """
@@ -66,10 +95,12 @@ class HttpServerConnector(ParentConnector):
         super().__init__()
         
         # Import Flask here to avoid dependency in Nitro mode
-        from flask import Flask, request, jsonify
+        with profile.phase("import:flask"):
+            from flask import Flask, request, jsonify, Response
         self.flask = Flask
         self.request = request
         self.jsonify = jsonify
+        self.response_class = Response
         
         # Store or create Flask app
         self.app = app if app else Flask(__name__)
@@ -89,8 +120,13 @@ class HttpServerConnector(ParentConnector):
             
             # Call the handler and get response
             if self.request_handler:
-                response = self.request_handler(request_data)
-                return self.jsonify(response)
+                with self.track_connection():
+                    response = self.request_handler(request_data)
+                    with self.encode_timer():
+                        # Plain-text responses (e.g. /metrics) are served as-is
+                        if isinstance(response, str):
+                            return self.response_class(response, content_type=PROMETHEUS_CONTENT_TYPE)
+                        return self.jsonify(response)
             else:
                 return self.jsonify({"error": "No request handler registered"}), 500
         
@@ -127,6 +163,8 @@ class VsockServerConnector(ParentConnector):
         """
         super().__init__()
         self.port = port
+        # The length prefix comes from the host; never allocate more than this for it
+        self.max_message_bytes = int(os.environ.get('VSOCK_MAX_MESSAGE_BYTES', DEFAULT_MAX_MESSAGE_BYTES))
         self.socket = None
         self.listener_thread = None
         logger.info(f"Initialized VsockServerConnector on port {port}")
@@ -174,6 +212,11 @@ class VsockServerConnector(ParentConnector):
     
     def _handle_client(self, client_socket, addr):
         """Handle a client connection"""
+        with self.track_connection():
+            self._serve_client(client_socket)
+    
+    def _serve_client(self, client_socket):
+        """Read one length-prefixed request from the client and send the response"""
         try:
             # Set a timeout for receiving data
             client_socket.settimeout(5)
@@ -185,34 +228,46 @@ class VsockServerConnector(ParentConnector):
                 return
             
             msg_len = struct.unpack("!I", len_bytes)[0]
+            if msg_len > self.max_message_bytes:
+                logger.warning(f"Rejected message of length {msg_len} (max {self.max_message_bytes})")
+                response_bytes = json.dumps({
+                    "error": f"Message of {msg_len} bytes exceeds the limit of {self.max_message_bytes}"
+                }).encode('utf-8')
+                client_socket.sendall(struct.pack("!I", len(response_bytes)))
+                client_socket.sendall(response_bytes)
+                return
             logger.info(f"Receiving message of length {msg_len}")
             
-            # Receive the message data
-            data_bytes = b""
-            while len(data_bytes) < msg_len:
-                chunk = client_socket.recv(min(1024, msg_len - len(data_bytes)))
-                if not chunk:
+            # Receive the message data into a buffer preallocated up to the size
+            # limit; streamed /initialize chunks make messages of several MiB
+            data_bytes = bytearray(msg_len)
+            view = memoryview(data_bytes)
+            received = 0
+            while received < msg_len:
+                n = client_socket.recv_into(view[received:])
+                if not n:
                     break
-                data_bytes += chunk
+                received += n
             
             # Parse the message
-            request_data = json.loads(data_bytes.decode('utf-8'))
-            logger.info(f"Received request: {request_data}")
+            request_data = json.loads(view[:received].tobytes().decode('utf-8'))
+            endpoint = request_data.get('endpoint') if isinstance(request_data, dict) else request_data
+            logger.info(f"Received request for {endpoint}")
             
             # Handle the request
             if self.request_handler:
                 response = self.request_handler(request_data)
-                logger.info(f"Generated response: {response}")
                 
                 # Convert response to JSON and encode as bytes
-                response_bytes = json.dumps(response).encode('utf-8')
+                with self.encode_timer():
+                    response_bytes = json.dumps(response).encode('utf-8')
                 response_len = len(response_bytes)
                 
                 # Send the response length followed by the response data
                 client_socket.sendall(struct.pack("!I", response_len))
                 client_socket.sendall(response_bytes)
                 
-                logger.info(f"Sent response of length {response_len}")
+                logger.info(f"Sent response for {endpoint} of length {response_len}")
             else:
                 logger.error("No request handler registered")
         except Exception as e:
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import logging
+import threading
+
+from metrics import Histogram, format_labels
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-router')
+
+# Path parameter converters: <name>, <int:name>, <path:name>
+_CONVERTERS = {
+    "str": (r"[^/]+", str),
+    "int": (r"-?\d+", int),
+    "path": (r".+", str)
+}
+_PARAM_RE = re.compile(r"<(?:(\w+):)?(\w+)>")
+
+class RouteStats:
+    """Request, error and latency counters and latency histogram for a single route"""
+
+    __slots__ = ("requests", "errors", "total_seconds", "max_seconds", "histogram")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = Histogram()
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3)
+        }
+
+class Route:
+    """A registered route: pattern, handler and its compiled matcher"""
+
+    def __init__(self, pattern, handler, name=None):
+        self.pattern = pattern
+        self.handler = handler
+        self.name = name or pattern
+        self.params = []
+        self.stats = RouteStats()
+
+        regex = ""
+        pos = 0
+        for match in _PARAM_RE.finditer(pattern):
+            converter, param = match.group(1) or "str", match.group(2)
+            if converter not in _CONVERTERS:
+                raise ValueError(f"Unknown converter '{converter}' in route {pattern}")
+            regex += re.escape(pattern[pos:match.start()])
+            regex += f"(?P<{{prefix}}{param}>{_CONVERTERS[converter][0]})"
+            self.params.append((param, _CONVERTERS[converter][1]))
+            pos = match.end()
+        regex += re.escape(pattern[pos:])
+        self.regex_template = regex
+        # Literal text before the first parameter, e.g. "/jobs/" for "/jobs/<job_id>"
+        match = _PARAM_RE.search(pattern)
+        self.prefix = pattern[:match.start()] if match else pattern
+
+    @property
+    def is_static(self):
+        return not self.params
+
+class RouteRequest:
+    """The request passed through the middleware chain"""
+
+    __slots__ = ("endpoint", "data", "route", "params")
+
+    def __init__(self, endpoint, data, route, params):
+        self.endpoint = endpoint
+        self.data = data
+        self.route = route
+        self.params = params
+
+class Router:
+    """
+    Route registry for enclave endpoints.
+
+    Static routes are looked up in a dict. Parameterized routes are compiled into
+    a single alternation regex, so matching costs one dict lookup plus at most
+    one regex match regardless of how many routes are registered.
+
+    Handlers are called as handler(data, **params). Middleware is called as
+    middleware(request, call_next) and must return call_next(request) or a
+    response of its own. Every dispatch is timed and counted per route; a
+    response is counted as an error if the handler raises or returns a
+    (body, status) tuple with status >= 400.
+    """
+
+    def __init__(self):
+        self.static_routes = {}
+        self.dynamic_routes = []
+        self.middleware = []
+        self.lock = threading.Lock()
+        # (compiled regex, routes it indexes into), rebuilt lazily after add()
+        self._compiled = None
+        self._chain = self._call_handler
+
+    def add(self, pattern, handler, name=None):
+        """
+        Register a handler for a path pattern, replacing any route with the same pattern
+
+        Args:
+            pattern (str): Path pattern, e.g. "/jobs/<job_id>" or "/fibonacci/<int:n>"
+            handler (callable): Called as handler(data, **params)
+            name (str, optional): Name used in stats; defaults to the pattern
+        """
+        route = Route(pattern, handler, name)
+        with self.lock:
+            if route.is_static:
+                self.static_routes[pattern] = route
+            else:
+                self.dynamic_routes = [r for r in self.dynamic_routes if r.pattern != pattern] + [route]
+                self._compiled = None
+        return route
+
+    def route(self, pattern, name=None):
+        """Decorator form of add()"""
+        def decorator(handler):
+            self.add(pattern, handler, name)
+            return handler
+        return decorator
+
+    def use(self, middleware):
+        """
+        Append a middleware to the chain
+
+        Args:
+            middleware (callable): Called as middleware(request, call_next)
+        """
+        self.middleware.append(middleware)
+        chain = self._call_handler
+        for mw in reversed(self.middleware):
+            chain = (lambda mw, nxt: lambda request: mw(request, nxt))(mw, chain)
+        self._chain = chain
+
+    @staticmethod
+    def _call_handler(request):
+        return request.route.handler(request.data, **request.params)
+
+    def _compile(self):
+        routes = list(self.dynamic_routes)
+        alternatives = [
+            f"(?P<_r{i}>{route.regex_template.format(prefix=f'_r{i}_')})"
+            for i, route in enumerate(routes)
+        ]
+        return (re.compile("|".join(alternatives)) if alternatives else None), routes
+
+    def match(self, endpoint):
+        """
+        Find the route for an endpoint
+
+        Args:
+            endpoint (str): The request path
+
+        Returns:
+            tuple: (route, params) or (None, None) if no route matches
+        """
+        route = self.static_routes.get(endpoint)
+        if route is not None:
+            return route, {}
+
+        compiled = self._compiled
+        if compiled is None:
+            with self.lock:
+                if self._compiled is None:
+                    self._compiled = self._compile()
+                compiled = self._compiled
+        regex, routes = compiled
+        if regex is None:
+            return None, None
+
+        match = regex.fullmatch(endpoint)
+        if match is None:
+            return None, None
+
+        # The outer group of the matching alternative closes last
+        index = int(match.lastgroup[2:])
+        route = routes[index]
+        prefix = f"_r{index}_"
+        params = {}
+        try:
+            for param, convert in route.params:
+                params[param] = convert(match.group(prefix + param))
+        except ValueError:
+            return None, None
+        return route, params
+
+    def matches_prefix(self, endpoint):
+        """
+        Whether an endpoint falls under a parameterized route without matching it,
+        e.g. "/fibonacci/" or "/fibonacci/1/2" for "/fibonacci/<n>"
+
+        Args:
+            endpoint (str): The request path
+
+        Returns:
+            bool: True if the endpoint starts with a dynamic route's literal prefix
+        """
+        with self.lock:
+            return any(endpoint.startswith(route.prefix) for route in self.dynamic_routes)
+
+    def dispatch(self, endpoint, data):
+        """
+        Dispatch a request through the middleware chain to its route handler
+
+        Args:
+            endpoint (str): The request path
+            data: The request data
+
+        Returns:
+            tuple: (matched, response); matched is False if no route matches
+        """
+        route, params = self.match(endpoint)
+        if route is None:
+            return False, None
+
+        request = RouteRequest(endpoint, data, route, params)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self._chain(request)
+            failed = isinstance(response, tuple) and len(response) == 2 and \
+                isinstance(response[1], int) and response[1] >= 400
+            return True, response
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = route.stats
+            with self.lock:
+                stats.requests += 1
+                stats.errors += failed
+                stats.total_seconds += elapsed
+                if elapsed > stats.max_seconds:
+                    stats.max_seconds = elapsed
+                stats.histogram.observe(elapsed)
+
+    def stats(self):
+        """Return per-route request, error and latency counters"""
+        with self.lock:
+            routes = list(self.static_routes.values()) + list(self.dynamic_routes)
+            return {route.name: route.stats.to_dict() for route in routes}
+
+    def render_metrics(self):
+        """Return per-route request, error and latency metrics as Prometheus text lines"""
+        with self.lock:
+            routes = list(self.static_routes.values()) + list(self.dynamic_routes)
+            requests = ["# HELP enclave_requests_total Requests handled per route",
+                        "# TYPE enclave_requests_total counter"]
+            errors = ["# HELP enclave_request_errors_total Failed requests per route",
+                      "# TYPE enclave_request_errors_total counter"]
+            latency = ["# HELP enclave_request_duration_seconds Request latency per route, including middleware",
+                       "# TYPE enclave_request_duration_seconds histogram"]
+            for route in routes:
+                labels = (("route", route.name),)
+                requests.append(f"enclave_requests_total{format_labels(labels)} {route.stats.requests}")
+                errors.append(f"enclave_request_errors_total{format_labels(labels)} {route.stats.errors}")
+                latency.extend(route.stats.histogram.render("enclave_request_duration_seconds", labels))
+        return requests + errors + latency
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-sessions')
+
+DEFAULT_SESSION_ID = "default"
+
+class Session:
+    """Per-session state: initialization data, result and its cached signed settlement, status and chunk manifest"""
+
+    __slots__ = (
+        "session_id",
+        "init_data",
+        "result",
+        "result_version",
+        "settlement_cache",
+        "status_snapshot",
+        "result_manifest",
+        "init_version",
+        "created_at",
+        "last_used",
+        "lock"
+    )
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.init_data = None
+        self.result = None
+        self.result_version = 0
+        self.settlement_cache = None
+        self.status_snapshot = None
+        self.result_manifest = None
+        self.init_version = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = threading.RLock()
+
+class SessionStore:
+    """
+    Thread-safe table of sessions keyed by session id.
+
+    Sessions are created on first use and kept in least-recently-used order.
+    Sessions idle for longer than `idle_ttl` seconds, or beyond `max_sessions`,
+    are evicted. The default session, used by requests without a session id,
+    is never evicted.
+    """
+
+    def __init__(self, idle_ttl=None, max_sessions=None):
+        """
+        Initialize the session store
+
+        Args:
+            idle_ttl (int, optional): Idle seconds before a session is evicted.
+                Defaults to SESSION_IDLE_TTL or 3600.
+            max_sessions (int, optional): Maximum number of sessions kept.
+                Defaults to SESSION_MAX or 1024.
+        """
+        self.idle_ttl = idle_ttl or int(os.environ.get('SESSION_IDLE_TTL', 3600))
+        self.max_sessions = max_sessions or int(os.environ.get('SESSION_MAX', 1024))
+        self.default_session = Session(DEFAULT_SESSION_ID)
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id=None):
+        """
+        Get the session for `session_id`, creating it if needed
+
+        Args:
+            session_id (str, optional): The session id; None selects the default session
+
+        Returns:
+            Session: The session
+        """
+        if session_id is None or session_id == DEFAULT_SESSION_ID:
+            self.default_session.last_used = time.time()
+            return self.default_session
+
+        session_id = str(session_id)
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self.sessions[session_id] = session
+                logger.info(f"Created session {session_id}")
+            else:
+                self.sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            self._evict()
+            return session
+
+    def find(self, session_id):
+        """
+        Get the session for `session_id` without creating it or refreshing its use
+
+        Args:
+            session_id (str): The session id
+
+        Returns:
+            Session: The session, or None if it does not exist
+        """
+        if session_id is None or session_id == DEFAULT_SESSION_ID:
+            return self.default_session
+        with self.lock:
+            return self.sessions.get(str(session_id))
+
+    def all(self):
+        """Return all sessions, the default session first"""
+        with self.lock:
+            return [self.default_session] + list(self.sessions.values())
+
+    def _evict(self):
+        """Evict idle and least recently used sessions. Caller holds the lock."""
+        cutoff = time.time() - self.idle_ttl
+        evicted = 0
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and session.last_used >= cutoff:
+                break
+            del self.sessions[session_id]
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} sessions")
+
+    def __len__(self):
+        with self.lock:
+            return len(self.sessions) + 1
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import logging
+import contextlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-startup')
+
+# Taken when this module is first imported, i.e. at the start of enclave boot
+_BOOT_START = time.perf_counter()
+
+class StartupProfile:
+    """
+    Opt-in breakdown of enclave boot time by import and init phase.
+
+    Enabled with STARTUP_PROFILE=1. When disabled, phase() is a no-op, so the
+    hooks can stay in the boot path. Phases may nest; each is reported with
+    its own wall time and its offset from the start of boot.
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get('STARTUP_PROFILE', 'false').lower() in ('true', '1', 'yes')
+        self.enabled = enabled
+        self.phases = []
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the block as boot phase `name`"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.phases.append({
+                "phase": name,
+                "depth": depth,
+                "start_ms": round((start - _BOOT_START) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3)
+            })
+
+    def report(self):
+        """
+        Log and return the startup report
+
+        Returns:
+            dict: Total boot time and the phases in start order, or None if disabled
+        """
+        if not self.enabled:
+            return None
+
+        phases = sorted(self.phases, key=lambda p: p["start_ms"])
+        total_ms = round((time.perf_counter() - _BOOT_START) * 1000, 3)
+        logger.info(f"Startup report: {total_ms} ms since boot")
+        for p in phases:
+            logger.info(f"  {'  ' * p['depth']}{p['phase']}: {p['duration_ms']} ms (at {p['start_ms']} ms)")
+        return {
+            "total_ms": total_ms,
+            "phases": phases
+        }
+
+# Process-wide profile shared by the boot path
+profile = StartupProfile()
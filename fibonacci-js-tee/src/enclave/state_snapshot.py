@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import base64
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('enclave-snapshot')
+
+SNAPSHOT_FORMAT = 1
+
+class SnapshotError(Exception):
+    """A snapshot could not be sealed or unsealed"""
+
+def _header(envelope):
+    """The envelope fields authenticated as associated data"""
+    return json.dumps({
+        "format": envelope["format"],
+        "created_at": envelope["created_at"],
+        "key_blob": envelope["key_blob"]
+    }, sort_keys=True).encode('utf-8')
+
+def seal(state, key, key_blob):
+    """
+    Encrypt app state into a snapshot envelope with AES-256-GCM
+
+    Args:
+        state (dict): JSON-serializable app state
+        key (bytes): 32-byte sealing key
+        key_blob (str): Opaque blob the KMS service turns back into `key`
+
+    Returns:
+        dict: The envelope, safe to hand to the parent for storage
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    envelope = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": int(time.time()),
+        "key_blob": key_blob
+    }
+    nonce = os.urandom(12)
+    plaintext = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    ciphertext = AESGCM(key).encrypt(nonce, plaintext, _header(envelope))
+    envelope["nonce"] = base64.b64encode(nonce).decode('utf-8')
+    envelope["ciphertext"] = base64.b64encode(ciphertext).decode('utf-8')
+    return envelope
+
+def unseal(envelope, key):
+    """
+    Decrypt and authenticate a snapshot envelope
+
+    Args:
+        envelope (dict): Envelope produced by seal()
+        key (bytes): The sealing key recovered from envelope["key_blob"]
+
+    Returns:
+        dict: The app state
+
+    Raises:
+        SnapshotError: If the envelope is malformed or fails authentication
+    """
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    try:
+        if envelope.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Unsupported snapshot format {envelope.get('format')}")
+        nonce = base64.b64decode(envelope["nonce"])
+        ciphertext = base64.b64decode(envelope["ciphertext"])
+        plaintext = AESGCM(key).decrypt(nonce, ciphertext, _header(envelope))
+        return json.loads(plaintext)
+    except InvalidTag:
+        raise SnapshotError("Snapshot failed authentication")
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise SnapshotError(f"Malformed snapshot: {e}")
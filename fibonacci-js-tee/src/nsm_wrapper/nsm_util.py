@@ -2,16 +2,35 @@
 This file is modified based on donkersgoed's repository (https://github.com/donkersgoed/nitropepper-enclave-app)
 """
 
+import ctypes
+import fcntl
+
+import cbor2
 import Crypto
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization
-from eth_utils import keccak
 from eth_keys import keys
 import ecies
 
 import libnsm
 
+# Shared with the enclave app (/app/enclave); NSMUtil is only loaded inside the enclave process
+from eth_signer import EthSigner
+
+# NSM driver ioctl (linux/nsm.h): the request and response are CBOR buffers
+# passed as a pair of iovecs
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _NsmMessage(ctypes.Structure):
+    _fields_ = [("request", _IoVec), ("response", _IoVec)]
+
+NSM_IOCTL_REQUEST = (3 << 30) | (ctypes.sizeof(_NsmMessage) << 16) | (0x0A << 8) | 0
+NSM_RESPONSE_MAX_SIZE = 0x3000
+# NSM limit for each of nonce, user_data and public_key
+NSM_ATTESTATION_FIELD_MAX_SIZE = 512
+
 class NSMRandomNumberGenerator:
     """Custom random number generator that uses NSM."""
     
@@ -52,16 +71,63 @@ class NSMUtil():
         # Extract raw private key bytes for eth_keys compatibility
         private_bytes = self._private_key.private_numbers().private_value.to_bytes(32, byteorder='big')
         self._eth_private_key = keys.PrivateKey(private_bytes)
+        # Raw scalar for ECIES, prepared once instead of per decryption
+        self._ecies_private_key = private_bytes
         self._eth_public_key = self._eth_private_key.public_key
+        
+        # Signer built once for this key; uses coincurve (libsecp256k1) when available
+        self._signer = EthSigner(private_bytes)
 
-    def get_attestation_doc(self):
-        """Get the attestation document from /dev/nsm."""
-        libnsm_att_doc_cose_signed = libnsm.nsm_get_attestation_doc( # pylint:disable=c-extension-no-member
-            self._nsm_fd,
-            self._public_key,
-            len(self._public_key)
-        )
-        return libnsm_att_doc_cose_signed
+    def get_attestation_doc(self, nonce=None, user_data=None):
+        """
+        Get the attestation document from /dev/nsm.
+        
+        Args:
+            nonce: Optional nonce (bytes, at most 512) bound into the document
+            user_data: Optional user data (bytes, at most 512) bound into the document
+            
+        Returns:
+            bytes: The COSE_Sign1 attestation document
+        """
+        if nonce is None and user_data is None:
+            libnsm_att_doc_cose_signed = libnsm.nsm_get_attestation_doc( # pylint:disable=c-extension-no-member
+                self._nsm_fd,
+                self._public_key,
+                len(self._public_key)
+            )
+            return libnsm_att_doc_cose_signed
+        
+        # libnsm only takes the public key; send the full request to the driver instead
+        for name, value in (("nonce", nonce), ("user_data", user_data)):
+            if value is not None and len(value) > NSM_ATTESTATION_FIELD_MAX_SIZE:
+                raise ValueError(f"{name} exceeds {NSM_ATTESTATION_FIELD_MAX_SIZE} bytes")
+        response = self._nsm_request({
+            "Attestation": {
+                "user_data": user_data,
+                "nonce": nonce,
+                "public_key": self._public_key
+            }
+        })
+        return response["Attestation"]["document"]
+    
+    def _nsm_request(self, request):
+        """Send a CBOR request to the NSM driver and return the decoded response"""
+        request_bytes = cbor2.dumps(request)
+        request_buffer = ctypes.create_string_buffer(request_bytes, len(request_bytes))
+        response_buffer = ctypes.create_string_buffer(NSM_RESPONSE_MAX_SIZE)
+        
+        message = _NsmMessage()
+        message.request.iov_base = ctypes.addressof(request_buffer)
+        message.request.iov_len = len(request_bytes)
+        message.response.iov_base = ctypes.addressof(response_buffer)
+        message.response.iov_len = NSM_RESPONSE_MAX_SIZE
+        
+        fcntl.ioctl(self._nsm_fd, NSM_IOCTL_REQUEST, message)
+        
+        response = cbor2.loads(response_buffer.raw[:message.response.iov_len])
+        if "Error" in response:
+            raise RuntimeError(f"NSM request failed: {response['Error']}")
+        return response
     
     def decrypt(self, ciphertext):
         """
@@ -74,13 +140,8 @@ class NSMUtil():
         Returns:
             bytes: Decrypted plaintext
         """
-        # Extract the raw private key bytes in the format expected by eciespy
-        private_key_hex = hex(self._private_key.private_numbers().private_value)[2:]
-        if len(private_key_hex) < 64:  # Ensure proper padding
-            private_key_hex = '0' * (64 - len(private_key_hex)) + private_key_hex
-            
         # Decrypt using ECIES
-        plaintext = ecies.decrypt(private_key_hex, ciphertext)
+        plaintext = ecies.decrypt(self._ecies_private_key, ciphertext)
         return plaintext
     
     def sign_data(self, data: bytes) -> bytes:
@@ -93,25 +154,4 @@ class NSMUtil():
         Returns:
             bytes: The signature in Ethereum format (65 bytes: r, s, v)
         """
-        # Generate hash using keccak256 directly on the raw bytes
-        message_hash = keccak(data)
-        
-        # Sign the message hash using eth_keys
-        signature = self._eth_private_key.sign_msg_hash(message_hash)
-        sig_bytes = signature.to_bytes()
-        
-        # Extract components
-        r = sig_bytes[:32]
-        s = sig_bytes[32:64]
-        v = sig_bytes[64:]
-        v_int = int.from_bytes(v, byteorder='big')
-        
-        # For Ethereum compatibility, make sure v is 27/28 instead of 0/1
-        if v_int < 27 and v_int <= 1:
-            v_adjusted = bytes([v_int + 27])
-            ethereum_sig = r + s + v_adjusted
-        else:
-            ethereum_sig = sig_bytes
-        
-        # Return the complete signature
-        return ethereum_sig
\ No newline at end of file
+        return self._signer.sign(data)
\ No newline at end of file
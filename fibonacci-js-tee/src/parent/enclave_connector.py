@@ -8,6 +8,7 @@ import time
 import logging
 import traceback
 import base64
+import hashlib
 import random
 import string
 import abc
@@ -75,6 +76,146 @@ class EnclaveConnector(abc.ABC):
             logger.error(traceback.format_exc())
             return {"error": str(e)}
 
+    def iter_result_chunks(self, session_id=None, timeout=5):
+        """
+        Stream the enclave's result chunk by chunk with bounded memory
+        
+        Fetches /result/manifest, then each chunk from /result/chunks/<offset>,
+        checking every chunk against its manifest digest and the whole result
+        against the manifest's result digest.
+        
+        Args:
+            session_id (str, optional): The session whose result is read
+            timeout: Per-request timeout in seconds
+            
+        Yields:
+            bytes: The verified result chunks in order
+            
+        Raises:
+            RuntimeError: If a request fails, the result changes while reading,
+                or a digest does not match
+        """
+        session_data = {"session_id": session_id} if session_id else {}
+        response = self.send_request({"endpoint": "/result/manifest", "data": session_data}, timeout)
+        if not isinstance(response, dict) or response.get("status") != "success":
+            raise RuntimeError(f"Failed to get result manifest: {response}")
+        manifest = response["manifest"]
+        
+        digest = hashlib.sha256()
+        for chunk_info in manifest["chunks"]:
+            response = self.send_request({
+                "endpoint": f"/result/chunks/{chunk_info['offset']}",
+                "data": {**session_data, "version": manifest["version"]}
+            }, timeout)
+            if not isinstance(response, dict) or response.get("status") != "success":
+                raise RuntimeError(f"Failed to get result chunk at offset {chunk_info['offset']}: {response}")
+            
+            chunk = base64.b64decode(response["data"])
+            if hashlib.sha256(chunk).hexdigest() != chunk_info["sha256"]:
+                raise RuntimeError(f"Digest mismatch for result chunk at offset {chunk_info['offset']}")
+            digest.update(chunk)
+            yield chunk
+        
+        if digest.hexdigest() != manifest["result_digest"]:
+            raise RuntimeError("Digest mismatch for the assembled result")
+
+    def get_enclave_public_key(self, timeout=5):
+        """Get the enclave public key (DER) from its formatted attestation document"""
+        response = self.send_request({"endpoint": "/formatted-attest", "data": {}}, timeout)
+        if not isinstance(response, dict) or response.get("status") != "success":
+            raise RuntimeError(f"Failed to get attestation: {response}")
+        return base64.b64decode(response["attestation"]["public_key"])
+    
+    def stream_initialize(self, source, size=None, session_id=None, chunk_size=None, timeout=30, retries=3):
+        """
+        Initialize the enclave from a file object in encrypted chunks
+        
+        A fresh AES-256-GCM key is ECIES-encrypted to the enclave public key and
+        the data is sent in chunks sealed under it (see src/enclave/init_stream.py),
+        so memory use is bounded by the chunk size. After a failed chunk the upload
+        resumes from the enclave's resume point, so `source` must be seekable.
+        
+        Args:
+            source: Binary file object with the initialization data
+            size (int, optional): Size of the data, checked by the enclave.
+                Defaults to the size of `source`.
+            session_id (str, optional): The session to initialize
+            chunk_size (int, optional): Plaintext bytes per chunk. Defaults to
+                INIT_CHUNK_SIZE or 1 MiB.
+            timeout: Per-request timeout in seconds
+            retries: Consecutive failed chunk requests before giving up
+            
+        Returns:
+            dict: The enclave's final upload status, including the data's SHA-256
+            
+        Raises:
+            RuntimeError: If the upload cannot be opened or a chunk keeps failing
+        """
+        import ecies
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        chunk_size = chunk_size or int(os.environ.get('INIT_CHUNK_SIZE', 1024 * 1024))
+        if size is None:
+            size = source.seek(0, os.SEEK_END)
+        session_data = {"session_id": session_id} if session_id else {}
+        
+        public_key = serialization.load_der_public_key(self.get_enclave_public_key(timeout)).public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+        key = AESGCM.generate_key(bit_length=256)
+        response = self.send_request({
+            "endpoint": "/initialize/stream",
+            "data": {
+                **session_data,
+                "key": base64.b64encode(ecies.encrypt(public_key, key)).decode('utf-8'),
+                "size": size
+            }
+        }, timeout)
+        if not isinstance(response, dict) or response.get("status") != "success":
+            raise RuntimeError(f"Failed to open initialization upload: {response}")
+        upload_id = response["upload"]["upload_id"]
+        aead = AESGCM(key)
+        
+        index, offset, failures = 0, 0, 0
+        while True:
+            source.seek(offset)
+            chunk = source.read(chunk_size)
+            final = not chunk or offset + len(chunk) >= size
+            sealed = aead.encrypt(
+                b"\x00" * 4 + struct.pack("!Q", index),
+                chunk,
+                b"init-chunk" + struct.pack("!Q?", index, final)
+            )
+            response = self.send_request({
+                "endpoint": f"/initialize/stream/{upload_id}/chunks/{index}",
+                "data": {
+                    **session_data,
+                    "data": base64.b64encode(sealed).decode('utf-8'),
+                    "final": final
+                }
+            }, timeout)
+            
+            if not isinstance(response, dict) or response.get("status") != "success":
+                failures += 1
+                if failures >= retries:
+                    raise RuntimeError(f"Failed to send chunk {index} of upload {upload_id}: {response}")
+                logger.warning(f"Chunk {index} of upload {upload_id} failed, resuming: {response}")
+                
+                # Continue from wherever the enclave actually is
+                response = self.send_request({
+                    "endpoint": f"/initialize/stream/{upload_id}",
+                    "data": session_data
+                }, timeout)
+                if not isinstance(response, dict) or response.get("status") != "success":
+                    continue
+            else:
+                failures = 0
+            
+            upload = response["upload"]
+            if upload["complete"]:
+                return upload
+            index, offset = upload["next_index"], upload["received_bytes"]
+
 class SimulationConnector(EnclaveConnector):
     """
     Connector for simulation mode using HTTP
@@ -94,7 +235,7 @@ class SimulationConnector(EnclaveConnector):
     
     def send_request(self, request_data, timeout=5):
         """Send a request to the enclave"""
-        logger.info(f"Sending request to enclave: {request_data}")
+        logger.info(f"Sending request to enclave: {request_data.get('endpoint')}")
         try:
             endpoint = request_data.get("endpoint", "").lstrip("/")
             data = request_data.get("data", {})
@@ -108,8 +249,12 @@ class SimulationConnector(EnclaveConnector):
                 logger.error(f"Error response from enclave: {response.status_code} - {response.text}")
                 return {"error": f"HTTP error: {response.status_code}"}
             
+            # Plain-text responses (e.g. /metrics) are returned as a string
+            if response.headers.get("Content-Type", "").startswith("text/plain"):
+                return response.text
+            
             response_data = response.json()
-            logger.info(f"Received response: {response_data}")
+            logger.info(f"Received response for /{endpoint} of length {len(response.content)}")
             return response_data
         except Exception as e:
             logger.error(f"Error sending request: {e}")
@@ -149,7 +294,7 @@ class NitroConnector(EnclaveConnector):
     
     def send_request(self, request_data, timeout=5):
         """Send a request to the enclave using VSOCK"""
-        logger.info(f"Sending request to enclave: {request_data}")
+        logger.info(f"Sending request to enclave: {request_data.get('endpoint')}")
         try:
             # Create a VSOCK socket
             sock = socket.socket(socket.AF_VSOCK, socket.SOCK_STREAM)
@@ -190,7 +335,7 @@ class NitroConnector(EnclaveConnector):
             
             # Parse the response
             response_data = json.loads(response_bytes.decode('utf-8'))
-            logger.info(f"Response received: {response_data}")
+            logger.info(f"Received response for {request_data.get('endpoint')} of length {response_len}")
             
             # Close the socket
             sock.close()
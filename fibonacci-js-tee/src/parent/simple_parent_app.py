@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 
+import io
 import os
-import base64
+import json
+import time
 import logging
+import threading
 import traceback
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from enclave_connector import create_connector
 
 # Configure logging
@@ -24,7 +27,7 @@ def handle_request(path):
     global initialized
     if not initialized:
         logger.info("Initializing enclave")
-        initialize_enclave()
+        start_enclave_state()
         initialized = True
     """Forward all requests to the enclave"""
     try:
@@ -37,56 +40,127 @@ def handle_request(path):
             "data": data
         })
         
-        # Return the enclave's response directly
+        # Return the enclave's response directly; plain text (e.g. /metrics) is passed through
+        if isinstance(response, str):
+            return Response(response, content_type="text/plain; version=0.0.4; charset=utf-8")
         return jsonify(response)
     except Exception as e:
         logger.error(f"Error forwarding request: {e}")
         return jsonify({"error": str(e)}), 500
 
 def initialize_enclave():
-    """Initialize the enclave with data from environment variables"""
+    """
+    Initialize the enclave from INIT_DATA_FILE, or from hex INIT_DATA
+    
+    The data is streamed to the enclave in encrypted, resumable chunks of
+    INIT_CHUNK_SIZE bytes, so INIT_DATA_FILE may be far larger than memory.
+    """
     try:
-        # Get initialization data from environment variable
+        # Get initialization data from a file or environment variable
+        init_file = os.environ.get('INIT_DATA_FILE')
         init_data = os.environ.get('INIT_DATA')
-        if not init_data:
+        if init_file:
+            source = open(init_file, 'rb')
+            logger.info(f"Found initialization data file: {init_file}")
+        elif init_data:
+            if init_data.startswith('0x'):
+                # Remove '0x' prefix if present
+                init_data = init_data[2:]
+            source = io.BytesIO(bytes.fromhex(init_data))
+            logger.info(f"Found {len(init_data) // 2} bytes of initialization data")
+        else:
             logger.warning("No initialization data found in environment")
             return
-            
-        logger.info(f"Found initialization data: {init_data}")
-            
-        if init_data.startswith('0x'):
-            # Remove '0x' prefix if present
-            init_data = init_data[2:]
-            
-        # Convert hex string to bytes and then to base64
-        init_bytes = bytes.fromhex(init_data)
-        init_base64 = base64.b64encode(init_bytes).decode('utf-8')
-        
-        logger.info("Sending initialization data to enclave...")
         
-        # Send initialization request to enclave
-        response = connector.send_request({
-            "endpoint": "/initialize",
-            "data": {
-                "data": init_base64
-            }
-        })
-        
-        if response.get("status") == "success":
-            logger.info("Successfully initialized enclave")
-        else:
-            logger.error("Failed to initialize enclave", extra={"response": response})
+        logger.info("Streaming initialization data to enclave...")
+        with source:
+            upload = connector.stream_initialize(source)
+        logger.info(f"Successfully initialized enclave with {upload['received_bytes']} bytes (sha256 {upload['sha256']})")
             
     except Exception as e:
         logger.error(f"Error initializing enclave: {e}")
         logger.error(traceback.format_exc())
 
+def save_snapshot(if_changed=False):
+    """
+    Fetch a sealed state snapshot from the enclave and store it at SNAPSHOT_PATH
+    
+    Args:
+        if_changed (bool): Keep the stored snapshot if the enclave state is
+            unchanged since the enclave's last snapshot
+    """
+    snapshot_path = os.environ.get('SNAPSHOT_PATH')
+    if not snapshot_path:
+        return False
+    try:
+        response = connector.send_request({"endpoint": "/snapshot", "data": {"if_changed": if_changed}}, timeout=30)
+        if not isinstance(response, dict) or response.get("status") != "success":
+            logger.error(f"Failed to get snapshot from enclave: {response}")
+            return False
+        if response.get("unchanged") and os.path.exists(snapshot_path):
+            return True
+        if response.get("unchanged"):
+            # Nothing on disk to keep; ask for a full snapshot
+            return save_snapshot()
+        
+        # Write atomically so a crash never leaves a truncated snapshot behind
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(response["snapshot"], f)
+        os.replace(tmp_path, snapshot_path)
+        logger.info(f"Saved enclave snapshot to {snapshot_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving snapshot: {e}")
+        logger.error(traceback.format_exc())
+        return False
+
+def restore_snapshot():
+    """
+    Restore the enclave from the snapshot at SNAPSHOT_PATH, if there is one
+    
+    Returns:
+        bool: True if the enclave resumed from the snapshot
+    """
+    snapshot_path = os.environ.get('SNAPSHOT_PATH')
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return False
+    try:
+        with open(snapshot_path) as f:
+            snapshot = json.load(f)
+        response = connector.send_request({"endpoint": "/restore", "data": {"snapshot": snapshot}}, timeout=30)
+        if isinstance(response, dict) and response.get("status") == "success":
+            logger.info(f"Restored enclave from snapshot {snapshot_path}")
+            return True
+        logger.error(f"Enclave rejected snapshot: {response}")
+    except Exception as e:
+        logger.error(f"Error restoring snapshot: {e}")
+        logger.error(traceback.format_exc())
+    return False
+
+def snapshot_loop(interval):
+    """Periodically save enclave snapshots"""
+    while True:
+        time.sleep(interval)
+        save_snapshot(if_changed=True)
+
+def start_enclave_state():
+    """Resume the enclave from a stored snapshot, or initialize it from INIT_DATA"""
+    if not restore_snapshot():
+        initialize_enclave()
+    
+    # Keep the stored snapshot fresh (SNAPSHOT_INTERVAL seconds, 0 disables)
+    interval = int(os.environ.get('SNAPSHOT_INTERVAL', 60))
+    if os.environ.get('SNAPSHOT_PATH') and interval > 0:
+        threading.Thread(target=snapshot_loop, args=(interval,), daemon=True).start()
+
 if __name__ == '__main__':
     # Wait for enclave to be ready
     connector.wait_for_enclave()
 
-    # Initialize enclave with data from environment
-    initialize_enclave()
+    # Resume from a stored snapshot, or initialize enclave with data from environment
+    start_enclave_state()
+    initialized = True
     
     # Get port from environment variable
     port = int(os.environ.get('PARENT_PORT', 8001))
@@ -0,0 +1,136 @@
+"""Benchmarks for the Fibonacci ABCI app hot paths.
+
+Drives the app in-process (no CometBFT node) over inputs spanning several
+orders of magnitude and reports, per input:
+- decode: hex-prefix stripping + eth_abi decode of the initial data
+- compute: the Fibonacci computation itself, with its peak traced memory
+- encode: get_result_data(), i.e. the eth_abi encode of the result
+- settle: init() until status() reports done, including the worker process
+- status: a status() poll once the result is available
+
+Usage:
+    python bench/bench_fibonacci.py [--repeat N] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from eth_abi.abi import encode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import fib_engine  # noqa: E402
+from fibonacci import Fibonacci  # noqa: E402
+
+SINGLE_INPUTS = [10, 10**3, 10**6, 10**9, 10**18, 10**36, 2**255]
+BATCH_SIZES = [10, 100, 1000]
+SETTLE_TIMEOUT_SECONDS = 60
+
+
+def _timed(fn, repeat):
+    """Run fn `repeat` times and return latency stats in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': min(samples),
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.fmean(samples),
+        'max_ms': max(samples),
+    }
+
+
+def _peak_memory(fn):
+    """Return the peak traced memory in bytes while running fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _settle(app, initial_data):
+    app.init(initial_data)
+    deadline = time.monotonic() + SETTLE_TIMEOUT_SECONDS
+    while not app.status()[0]:
+        if time.monotonic() > deadline:
+            raise TimeoutError('computation did not settle in time')
+        time.sleep(0.001)
+
+
+def bench_case(label, initial_data, repeat):
+    app = Fibonacci()
+    # Measure the computation, not the shared result store
+    app.store = None
+
+    hex_data = initial_data[2:] if initial_data.startswith('0x') else initial_data
+
+    def decode():
+        return Fibonacci.decode_input(bytes.fromhex(hex_data))
+
+    kind, value = decode()
+    app.result = Fibonacci.compute(kind, value)
+
+    return {
+        'label': label,
+        'kind': kind,
+        'input_bytes': len(hex_data) // 2,
+        'decode': _timed(decode, repeat),
+        'compute': _timed(lambda: Fibonacci.compute(kind, value), repeat),
+        'compute_peak_memory_bytes': _peak_memory(lambda: Fibonacci.compute(kind, value)),
+        'encode': _timed(app.get_result_data, repeat),
+        'status': _timed(app.status, repeat),
+        'settle': _timed(lambda: _settle(app, initial_data), max(1, repeat // 10)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50, help='samples per measurement')
+    parser.add_argument('--output', help='write results as JSON to this file instead of stdout')
+    args = parser.parse_args()
+
+    cases = []
+    for n in SINGLE_INPUTS:
+        cases.append((f'n={n}', '0x' + encode(['uint256'], [n]).hex()))
+    for size in BATCH_SIZES:
+        indices = [(i * 7919) ** 3 for i in range(size)]
+        cases.append((f'batch={size}', '0x' + encode(['uint256[]'], [indices]).hex()))
+
+    results = []
+    for label, initial_data in cases:
+        print(f'benchmarking {label}', file=sys.stderr)
+        # The app logs with print(); keep stdout clean for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            results.append(bench_case(label, initial_data, args.repeat))
+
+    report = {
+        'timestamp': int(time.time()),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'backend': fib_engine.BACKEND,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,241 @@
+import json
+import multiprocessing
+import os
+import time
+from typing import List
+
 from eth_abi.abi import decode, encode
 
 from py_abci.base_app import BaseApplication, HexString
+from py_abci.websocket_pb2 import Message, BatchMessage
+from cometbft.abci.v1 import types_pb2
+
+import fib_engine
+from result_store import ResultStore, make_key
+
+DEFAULT_DEADLINE_SECONDS = 300
+# Inputs with fewer indices than this are computed inline; each index costs
+# well under a millisecond mod 2^256, far less than starting a worker process
+DEFAULT_ASYNC_THRESHOLD = 64
+
+# The ABCI service runs gRPC threads, which are not fork-safe
+_mp_context = multiprocessing.get_context('spawn')
+
+
+def _compute_worker(conn, kind, value):
+    """Worker process entry point: compute the result and send it back over `conn`"""
+    try:
+        conn.send((True, Fibonacci.compute(kind, value)))
+    except Exception as e:
+        conn.send((False, str(e)))
+    finally:
+        conn.close()
 
 
 class Fibonacci(BaseApplication):
     def __init__(self):
         self.result = 0
+        # Set once a result is stored; 0 is a valid result mod 2^256, so it can't be the sentinel
+        self._done = False
+        self.block_height = 0
+        self.store = ResultStore.from_env()
+        self.deadline_seconds = float(os.environ.get('FIB_DEADLINE_SECONDS', DEFAULT_DEADLINE_SECONDS))
+        self.async_threshold = int(os.environ.get('FIB_ASYNC_THRESHOLD', DEFAULT_ASYNC_THRESHOLD))
+        # (process, connection, store key, deadline) of the computation in flight
+        self._job = None
 
     def init(self, initial_data: str):
+        self.cancel()
+        self._done = False
         if initial_data:
             try:
                 # Remove '0x' prefix if it exists, otherwise use as-is
                 hex_data = initial_data[2:] if initial_data.startswith('0x') else initial_data
-                decoded = decode(['uint256'], bytes.fromhex(hex_data))
-                self.result = self.fibonacci(int(decoded[0]))
-                print(f'Fibonacci result: {self.result}')
-                print(f'Fibonacci result settlement data: {self.get_result_data()}')
+                kind, value = self.decode_input(bytes.fromhex(hex_data))
+
+                key = make_key(kind, value)
+                cached = self.store.get(key) if self.store else None
+                if self.store:
+                    print(f'Result store stats: {self.store.stats()}')
+                if cached is not None:
+                    self.result = cached
+                    self._done = True
+                    print(f'Fibonacci result: {self.result}')
+                    print(f'Fibonacci result settlement data: {self.get_result_data()}')
+                elif kind == 'uint256' or len(value) < self.async_threshold:
+                    self.result = self.compute(kind, value)
+                    self._done = True
+                    if self.store:
+                        self.store.put(key, self.result)
+                    print(f'Fibonacci result: {self.result}')
+                    print(f'Fibonacci result settlement data: {self.get_result_data()}')
+                else:
+                    # Compute in a worker process so the ABCI loop keeps serving status()
+                    self.result = 0
+                    self._start_job(key, kind, value)
             except Exception as e:
                 print(f"Error decoding initial data: {e}")
                 self.result = 0
         else:
             self.result = 1
+            self._done = True
             print("no initial data")
 
+    @staticmethod
+    def decode_input(raw: bytes):
+        """Decode initial data into its ABI kind and value"""
+        # A single uint256 is exactly one word; anything else is a uint256[] batch
+        if len(raw) == 32:
+            return 'uint256', int(decode(['uint256'], raw)[0])
+        return 'uint256[]', [int(v) for v in decode(['uint256[]'], raw)[0]]
+
+    @staticmethod
+    def compute(kind: str, value):
+        """Compute the settlement result for a decoded input"""
+        # Reduce mod 2^256 so any uint256 input fits the settlement encoding
+        if kind == 'uint256':
+            return Fibonacci.fibonacci(value, fib_engine.UINT256_MODULUS)
+        return fib_engine.fib_many(value, fib_engine.UINT256_MODULUS)
+
+    def _start_job(self, key: str, kind: str, value):
+        parent_conn, child_conn = _mp_context.Pipe(duplex=False)
+        process = _mp_context.Process(target=_compute_worker, args=(child_conn, kind, value), daemon=True)
+        process.start()
+        child_conn.close()
+        self._job = (process, parent_conn, key, time.monotonic() + self.deadline_seconds)
+        print(f'Started Fibonacci computation in worker process {process.pid}')
+
+    def _poll_job(self):
+        """Collect the worker's result if it is ready, or cancel it past its deadline"""
+        if self._job is None:
+            return
+        process, conn, key, deadline = self._job
+
+        ready = conn.poll()
+        if not ready and not process.is_alive():
+            # The worker may have sent its result and exited after the first poll
+            ready = conn.poll()
+
+        if ready:
+            try:
+                ok, payload = conn.recv()
+            except EOFError:
+                ok, payload = False, 'worker exited without a result'
+            self.cancel()
+            if ok:
+                self.result = payload
+                self._done = True
+                if self.store:
+                    self.store.put(key, self.result)
+                print(f'Fibonacci result: {self.result}')
+                print(f'Fibonacci result settlement data: {self.get_result_data()}')
+            else:
+                print(f'Error computing Fibonacci result: {payload}')
+                self.result = 0
+        elif not process.is_alive():
+            print(f'Fibonacci worker exited with code {process.exitcode}')
+            self.cancel()
+        elif time.monotonic() > deadline:
+            print(f'Fibonacci computation exceeded its {self.deadline_seconds}s deadline, cancelling')
+            self.cancel()
+
+    def cancel(self):
+        """Stop the computation in flight, if any"""
+        if self._job is None:
+            return
+        process, conn, _, _ = self._job
+        self._job = None
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        conn.close()
+
     def status(self):
         """Return end state and result"""
-        return self.result != 0, self.get_result_data()
+        self._poll_job()
+        return self._done, self.get_result_data()
+
+    def step(self, messages) -> List[types_pb2.Event]:
+        """Answer every Fibonacci query in the block with one sweep, one event per query"""
+        queries = []
+        for payload in self._parse_payloads(messages):
+            try:
+                queries.extend(self._decode_queries(payload))
+            except Exception as e:
+                print(f"Skipping undecodable Fibonacci query: {e}")
+
+        if not queries:
+            return []
+
+        results = fib_engine.fib_many(queries, fib_engine.UINT256_MODULUS)
+        print(f'Answered {len(queries)} Fibonacci queries at block {self.block_height}')
+        return [self._result_event(n, result) for n, result in zip(queries, results)]
+
+    def update(self, block_height):
+        """Track the block height reported with step() events"""
+        self.block_height = block_height
+
+    @staticmethod
+    def _parse_payloads(messages: bytes) -> List[bytes]:
+        """Split a step() message into the data payloads it carries"""
+        try:
+            batch_message = BatchMessage()
+            batch_message.ParseFromString(messages)
+            if batch_message.messages:
+                return [message.data for message in batch_message.messages]
+        except Exception:
+            pass
+        try:
+            message = Message()
+            message.ParseFromString(messages)
+            if message.data:
+                return [message.data]
+        except Exception:
+            pass
+        return [messages]
+
+    @classmethod
+    def _decode_queries(cls, payload: bytes) -> List[int]:
+        """Decode a query payload: JSON {"n": ...} / {"indices": [...]}, or ABI uint256 / uint256[]"""
+        try:
+            content = json.loads(payload.decode('utf-8'))
+        except ValueError:
+            content = None
+        if isinstance(content, dict):
+            indices = content['indices'] if 'indices' in content else [content['n']]
+        else:
+            _, value = cls.decode_input(payload)
+            indices = value if isinstance(value, list) else [value]
+
+        indices = [int(n) for n in indices]
+        for n in indices:
+            if not 0 <= n < fib_engine.UINT256_MODULUS:
+                raise ValueError(f"index {n} is not a uint256")
+        return indices
+
+    def _result_event(self, n: int, result: int) -> types_pb2.Event:
+        return types_pb2.Event(
+            type='fibonacci_result',
+            attributes=[
+                types_pb2.EventAttribute(key='index', value=str(n), index=True),
+                types_pb2.EventAttribute(key='result', value=str(result), index=True),
+                types_pb2.EventAttribute(key='block_height', value=str(self.block_height), index=True)
+            ]
+        )
 
     @staticmethod
-    def fibonacci(n: int) -> int:
-        if n <= 1:
-            return n
-        return Fibonacci.fibonacci(n - 1) + Fibonacci.fibonacci(n - 2)
+    def fibonacci(n: int, modulus: int = None) -> int:
+        """Return F(n) using the fast-doubling engine, optionally reduced mod `modulus`"""
+        return fib_engine.fibonacci(n, modulus)
 
     def get_result(self):
         return self.result
 
     def get_result_data(self) -> HexString:
         """Return result encoded for blockchain"""
+        # Batched sessions settle a uint256[] with one value per requested index
+        if isinstance(self.result, list):
+            return '0x' + encode(['uint256[]'], [self.result]).hex()
         # Add '0x' prefix to hex string
         return '0x' + encode(['uint256'], [self.result]).hex()
 
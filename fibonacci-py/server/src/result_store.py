@@ -0,0 +1,110 @@
+"""Disk-backed, content-addressed result store shared across ABCI sessions.
+
+Entries are JSON files named by the SHA-256 of the decoded input. Writes go
+through a temp file and os.replace so readers never see partial entries, and
+eviction runs under an flock so several processes can share one volume.
+Recency is tracked through file mtimes, which gives LRU eviction across all
+processes using the store.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SUFFIX = '.json'
+
+
+def make_key(kind: str, value) -> str:
+    """Return the content address for a decoded input of the given ABI kind"""
+    if isinstance(value, (list, tuple)):
+        canonical = ','.join(str(int(v)) for v in value)
+    else:
+        canonical = str(int(value))
+    return hashlib.sha256(f'{kind}:{canonical}'.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_path = os.path.join(self.path, '.lock')
+
+    @classmethod
+    def from_env(cls):
+        """Create a store from RESULT_STORE_DIR / RESULT_STORE_MAX_BYTES, or None if unset"""
+        path = os.environ.get('RESULT_STORE_DIR')
+        if not path:
+            return None
+        max_bytes = int(os.environ.get('RESULT_STORE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return cls(path, max_bytes)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key + _SUFFIX)
+
+    def get(self, key: str):
+        """Return the stored result for `key`, or None on a miss"""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as f:
+                result = json.load(f)['result']
+            # Bump mtime so this entry is the most recently used
+            os.utime(entry_path)
+        except (FileNotFoundError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result):
+        """Store `result` under `key` and evict least recently used entries if over budget"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'result': result}, f)
+            # mkstemp creates 0600 files; other processes on the volume need to read them
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = []
+                total = 0
+                for entry in os.scandir(self.path):
+                    if not entry.name.endswith(_SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+                entries.sort()
+                for _, size, entry_path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.unlink(entry_path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process"""
+        return {'hits': self.hits, 'misses': self.misses}